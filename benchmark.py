@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import scraper
+
+# Synthetic listings shaped like the rows scrape_run emits, for timing the post-scrape
+# stages (combine, merge, filter, notify) at sizes production hasn't reached yet.
+#   python benchmark.py --profiles 3 30 --history 1000 100000
+#   python benchmark.py --history 5000 --dump data/shards/shard-0-of-1.json
+
+# --- Generator defaults ---
+DEFAULT_COUNTRIES = {"France": 20, "Spain": 15, "Italy": 12, "Portugal": 8, "Germany": 8, "United Kingdom": 15,
+                     "Ireland": 4, "Greece": 4, "Netherlands": 5, "Belgium": 3, "Switzerland": 3, "Austria": 3}
+DEFAULT_PET_MIX = {"dog": 0.65, "cat": 0.55, "horse": 0.05, "bird": 0.04, "fish": 0.06, "rabbit": 0.04,
+                   "reptile": 0.02, "poultry": 0.08, "livestock": 0.03, "small_pets": 0.04}
+DEFAULT_DATE_FORMATS = ["%b %d, %Y", "%d %b %Y"]  # As shown on the listing cards
+TITLE_WORDS = (["Cosy", "Sunny", "Rural", "Seaside", "Mountain", "City", "Quiet", "Historic", "Family"],
+               ["farmhouse", "apartment", "villa", "cottage", "townhouse", "finca", "chalet", "flat"],
+               ["with two dogs", "and garden", "near the beach", "with a lazy cat", "over Christmas",
+                "in the hills", "with chickens", "for a month"])
+TOWNS = ["Lyon", "Valencia", "Bologna", "Porto", "Freiburg", "Bath", "Galway", "Chania", "Utrecht", "Ghent",
+         "Lucerne", "Graz", "Nice", "Seville", "Lucca", "Faro", "Leipzig", "York"]
+
+
+def _weighted_choice(rng: random.Random, weights: dict) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def make_listing(rng: random.Random, listing_id: int, countries: dict, pet_mix: dict, date_formats: list,
+                 missing_dates: float, start: datetime) -> dict:
+    """One listing row with the same fields and value shapes scrape_run produces"""
+    country = _weighted_choice(rng, countries)
+    town = rng.choice(TOWNS)
+    slug = country.lower().replace(' ', '-')
+    rel = f"/house-and-pet-sitting-assignments/europe/{slug}/{town.lower()}/l/{listing_id}/"
+    if rng.random() < missing_dates:
+        d1, d2 = '', ''
+    else:
+        begin = start + timedelta(days=rng.randint(0, 120))
+        end = begin + timedelta(days=rng.choice([3, 5, 7, 10, 14, 21, 30, 45]))
+        fmt = rng.choice(date_formats)
+        d1, d2 = begin.strftime(fmt), end.strftime(fmt)
+    row = {
+        'url': f"https://www.trustedhousesitters.com{rel}",
+        'listing_id': str(listing_id),
+        'date_range': f"{d1}→{d2}",
+        'title': " ".join(rng.choice(words) for words in TITLE_WORDS),
+        'location': f"{town}, {country}",
+        'town': town,
+        'country': country,
+        'date_from': d1,
+        'date_to': d2,
+        'reviewing': rng.random() < 0.2,
+        **{pet: (rng.randint(1, 3) if rng.random() < pet_mix.get(pet, 0) else 0) for pet in scraper.PET_TYPES},
+    }
+    row['content_hash'] = scraper.listing_fingerprint(row)
+    return row
+
+
+def make_profiles(count: int) -> dict:
+    """Profiles with a spread of the filters the real configuration uses"""
+    profiles = {}
+    for i in range(count):
+        filters = {"excluded_countries": ["United Kingdom", "Ireland"] if i % 2 == 0 else [],
+                   "max_pets": {"dog": 2} if i % 3 == 0 else {}}
+        if i % 4 == 1:
+            filters["min_days"] = 7
+        profiles[f"bench_{i}"] = {
+            "search": {"location": "Europe", "date_from": "1 Jan 2026", "date_to": "30 Apr 2026"},
+            "filters": filters,
+            "notification": {"header": f"BENCH {i}", "icon": "🏠", "channels": ["file"]},
+        }
+    return profiles
+
+
+def generate_dataset(profiles=3, listings=75, history=1000, churn=0.05, countries=None, pet_mix=None,
+                     date_formats=None, missing_dates=0.02, transport_share=0.3, car_share=0.2, seed=0,
+                     profile_configs=None) -> dict:
+    """A previous state and the next run's raw per-mode rows for `profiles` synthetic profiles,
+    or for the given `profile_configs` (e.g. load_profiles()) instead.
+
+    Each profile had `listings` live listings last run; this run `churn` of them have expired,
+    as many new ones appeared and half as many changed content. `history` is the total number
+    of listings in the state, live plus long expired ones.
+    """
+    rng = random.Random(seed)
+    countries = countries or DEFAULT_COUNTRIES
+    pet_mix = pet_mix or DEFAULT_PET_MIX
+    date_formats = date_formats or DEFAULT_DATE_FORMATS
+    start = datetime(2026, 1, 1)
+    next_id = iter(range(100000, 10 ** 9))
+    new_listing = lambda: make_listing(rng, next(next_id), countries, pet_mix, date_formats, missing_dates, start)
+
+    profile_configs = profile_configs or make_profiles(profiles)
+    profiles = len(profile_configs)
+    previous, current = {}, {}
+    for name in profile_configs:
+        rows = [new_listing() for _ in range(listings)]
+        previous[name] = rows
+        turnover = int(listings * churn)
+        kept = rows[turnover:]
+        for i in rng.sample(range(len(kept)), min(turnover // 2, len(kept))):
+            kept[i] = {**kept[i], 'reviewing': not kept[i]['reviewing']}
+            kept[i]['content_hash'] = scraper.listing_fingerprint(kept[i])
+        current[name] = kept + [new_listing() for _ in range(turnover)]
+
+    def runs_for(rows):
+        return {None: rows,
+                'public_transport': [r for r in rows if int(r['listing_id']) % 100 < transport_share * 100],
+                'car_included': [r for r in rows if (int(r['listing_id']) // 100) % 100 < car_share * 100]}
+
+    # Fold the long tail of history in first so it ends up expired, like listings from past seasons
+    names = list(profile_configs)
+    expired_count = max(0, history - profiles * listings)
+    old_runs = {name: runs_for([new_listing() for _ in range(expired_count // profiles)] + previous[name])
+                for name in names}
+    state, _ = scraper.merge_run({}, [scraper.combine_profile_runs(n, old_runs[n]) for n in names],
+                                 "2025-12-01T00:00:00Z")
+    state, _ = scraper.merge_run(state, [scraper.combine_profile_runs(n, runs_for(previous[n])) for n in names],
+                                 "2025-12-02T00:00:00Z")
+    return {'profiles': profile_configs, 'state': state, 'runs': {n: runs_for(current[n]) for n in names}}
+
+
+def write_shard_file(dataset: dict, path: str) -> None:
+    """Write the run's rows in the --shard output format, so --merge-shards can replay them"""
+    queries = [{'profile': name, 'mode': mode, 'complete': True, 'rows': rows}
+               for name, runs in dataset['runs'].items() for mode, rows in runs.items()]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'shard': 0, 'shard_count': 1, 'created': datetime.now(timezone.utc).isoformat(),
+                   'queries': queries}, f, ensure_ascii=False)
+
+
+# --- Benchmark ---
+def _copy_state(state: dict) -> dict:
+    return {key: dict(row) for key, row in state.items()}
+
+
+def run_stages(dataset: dict) -> dict:
+    """Run the post-scrape pipeline once, returning each stage's output"""
+    profiles = dataset['profiles']
+    frames = [scraper.combine_profile_runs(name, runs) for name, runs in dataset['runs'].items()]
+    state, events = scraper.merge_run(_copy_state(dataset['state']), frames, "2026-01-01T00:00:00Z")
+    new_rows = [state[ev['key']] for ev in events if ev['event'] == 'new']
+    alerts = scraper.build_alerts(profiles, new_rows)
+    sent = scraper.deliver_notifications(profiles, alerts, force=True)
+    return {'frames': frames, 'events': events, 'alerts': alerts, 'sent': sent}
+
+
+def measure(fn, repeat: int, setup=None) -> tuple[float, int]:
+    """Best wall time over `repeat` runs, and peak traced memory of one more run.
+
+    `setup`, if given, builds fn's argument outside the timed and traced region.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    arg = setup() if setup else None
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def benchmark(dataset: dict, repeat: int) -> dict:
+    profiles, runs = dataset['profiles'], dataset['runs']
+    out = run_stages(dataset)
+    new_rows = [ev['listing'] for ev in out['events'] if ev['event'] == 'new']
+    stages = {  # stage: (fn, setup)
+        'combine': (lambda _: [scraper.combine_profile_runs(name, r) for name, r in runs.items()], None),
+        'merge': (lambda state: scraper.merge_run(state, out['frames'], "2026-01-01T00:00:00Z"),
+                  lambda: _copy_state(dataset['state'])),
+        'filter': (lambda _: scraper.build_alerts(profiles, new_rows), None),
+        'format': (lambda _: [scraper.format_telegram_message(rows, profiles[name]) for name, rows in out['alerts']],
+                   None),
+        'notify': (lambda _: scraper.deliver_notifications(profiles, out['alerts'], force=True), None),
+    }
+    results = {}
+    for stage, (fn, setup) in stages.items():
+        seconds, peak = measure(fn, repeat, setup)
+        results[stage] = {'seconds': round(seconds, 4), 'peak_mib': round(peak / 2 ** 20, 2)}
+    counts = {}
+    for ev in out['events']:
+        counts[ev['event']] = counts.get(ev['event'], 0) + 1
+    results['events'] = counts
+    results['alerted'] = sum(len(rows) for _, rows in out['alerts'])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the post-scrape stages on synthetic listings")
+    parser.add_argument('--profiles', type=int, nargs='+', default=[3, 30], help='Profile counts to try')
+    parser.add_argument('--history', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Listings in the state (live and expired) to try')
+    parser.add_argument('--listings', type=int, default=75, help='Live listings per profile')
+    parser.add_argument('--churn', type=float, default=0.05, help='Share of listings replaced since the last run')
+    parser.add_argument('--countries', nargs='+', help='Countries to draw from (default: a weighted European mix)')
+    parser.add_argument('--pet-mix', type=json.loads, help='JSON {pet: probability a listing has it}')
+    parser.add_argument('--date-formats', nargs='+', help=f'strftime formats (default: {DEFAULT_DATE_FORMATS})')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    parser.add_argument('--dump', metavar='PATH',
+                        help=f'Write one run of listings for the profiles in {scraper.PROFILES_PATH} (first --history) '
+                             f'as a shard file for --merge-shards, and exit')
+    args = parser.parse_args()
+
+    gen_args = dict(listings=args.listings, churn=args.churn, pet_mix=args.pet_mix, date_formats=args.date_formats,
+                    countries=dict.fromkeys(args.countries, 1) if args.countries else None, seed=args.seed)
+    if args.dump:
+        # Use the real profile names, or --merge-shards would ignore every query
+        dataset = generate_dataset(profile_configs=scraper.load_profiles(), history=args.history[0], **gen_args)
+        write_shard_file(dataset, args.dump)
+        print(f"Wrote {sum(len(r[None]) for r in dataset['runs'].values())} listings to {args.dump}")
+        return
+
+    # Notifications go to a throwaway file sink and buffer
+    tmp = tempfile.mkdtemp(prefix="ths-bench-")
+    scraper.NOTIFY_CHANNELS = "file"
+    scraper.NOTIFY_FILE_PATH = os.path.join(tmp, "notifications.jsonl")
+    scraper.NOTIFY_BUFFER_PATH = os.path.join(tmp, "notify_buffer.json")
+
+    stage_names = ['combine', 'merge', 'filter', 'format', 'notify']
+    print(f"{'profiles':>8} {'history':>8} {'new':>5} " + " ".join(f"{s + ' s/MiB':>16}" for s in stage_names))
+    report = []
+    for profile_count in args.profiles:
+        for history in args.history:
+            dataset = generate_dataset(profiles=profile_count, history=history, **gen_args)
+            results = benchmark(dataset, args.repeat)
+            report.append({'profiles': profile_count, 'history': history, 'listings': args.listings,
+                           'churn': args.churn, **results})
+            print(f"{profile_count:>8} {len(dataset['state']):>8} {results['events'].get('new', 0):>5} "
+                  + " ".join(f"{results[s]['seconds']:>9.4f}/{results[s]['peak_mib']:<6.1f}" for s in stage_names))
+            sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,139 @@
+import time
+_process_started = time.perf_counter()
+import abc
 import asyncio
-from playwright.async_api import async_playwright
 import csv
 import os
 import random
-import pandas as pd
 import re
 import argparse
-import time
-import requests
 import logging
 import json
+import hashlib
+import calendar
+import concurrent.futures
+import functools
+import contextvars
+import marshal
+import array
+import bisect
+import sys
+import glob
 from datetime import datetime, timedelta, timezone
 
-# --- Setup logging ---
-# Ensure directories exist
-os.makedirs("data", exist_ok=True)
-os.makedirs("debug", exist_ok=True)
+# Heavy dependencies (pandas, playwright, requests, dotenv) are imported inside the functions
+# that use them, and importing the module has no side effects, so light subcommands and
+# tools that import scraper start quickly. The CLI sets up logging and the environment.
 
+# --- Setup logging ---
 LOG_PATH = "debug/scraper.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_PATH),
-        logging.StreamHandler()
-    ]
-)
 
-# --- Load environment variables ---
-if os.environ.get("GITHUB_ACTIONS") != "true":
-    from dotenv import load_dotenv
-    load_dotenv()
 
-TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+def setup_logging(log_file=True) -> None:
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        handlers.insert(0, logging.FileHandler(LOG_PATH))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", handlers=handlers)
+
+
+# --- Load environment variables ---
+def _read_env_settings() -> None:
+    global TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, THS_EMAIL, THS_PASSWORD, NOTIFY_CHANNELS
+    global SMTP_HOST, SMTP_PORT, SMTP_FROM, SMTP_TO, WEBHOOK_URL, POSTPROCESS_EXECUTOR
+    TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+    THS_EMAIL = os.environ.get("THS_EMAIL")
+    THS_PASSWORD = os.environ.get("THS_PASSWORD")
+    NOTIFY_CHANNELS = os.environ.get("THS_NOTIFY_CHANNELS")  # Comma-separated override of every profile's channels
+    SMTP_HOST = os.environ.get("THS_SMTP_HOST", "localhost")  # e.g. python -m aiosmtpd -n -l localhost:1025
+    SMTP_PORT = int(os.environ.get("THS_SMTP_PORT", "1025"))
+    SMTP_FROM = os.environ.get("THS_SMTP_FROM", "alerts@localhost")
+    SMTP_TO = os.environ.get("THS_SMTP_TO", "alerts@localhost")
+    WEBHOOK_URL = os.environ.get("THS_WEBHOOK_URL")
+    POSTPROCESS_EXECUTOR = os.environ.get("THS_POSTPROCESS_EXECUTOR", "thread")  # "thread", "process" or "inline"
+
+
+def load_environment() -> None:
+    """Load .env outside CI and re-read the settings that come from the environment"""
+    if os.environ.get("GITHUB_ACTIONS") != "true":
+        from dotenv import load_dotenv
+        load_dotenv()
+    _read_env_settings()
+
+
+_read_env_settings()
 HEADLESS = True  # Set to False for debugging
 MAX_CONCURRENT_BROWSERS = 1  # Number of browsers to run in parallel
+POSTPROCESS_WORKERS = 2
 
 # --- Configuration ---
 BASE_URL = "https://www.trustedhousesitters.com/house-and-pet-sitting-assignments/"
 PET_TYPES = ["dog", "cat", "horse", "bird", "fish", "rabbit", "reptile", "poultry", "livestock", "small_pets"]
 CONTENT_COLS = ["title", "location", "town", "country", "date_from", "date_to", "reviewing"] + PET_TYPES
 MODES = ['public_transport', 'car_included', None]
+FLAG_COLS = ['public_transport', 'car_included']
 CSV_PATH = "data/sits.csv"
 JSON_PATH = "data/sits.json"
 PROFILES_PATH = "filter_profiles.json"
+EVENTS_DIR = "data/events"
+EVENTS_CHECKPOINT_PATH = "data/events/state.json"
+SHARDS_DIR = "data/shards"
+EVENT_SEGMENT_MAX_BYTES = 512 * 1024  # Rotate to a new segment once the active one reaches this size
+NOTIFY_BUFFER_PATH = "data/notify_buffer.json"
+STREAMED_PATH = "data/streamed.json"
+STREAMED_MAX_AGE_DAYS = 60  # Forget streamed keys the merge never recorded after this long
+RUN_STATS_PATH = ".cache/last_run.json"
+NOTIFY_FILE_PATH = "debug/notifications.jsonl"
+DEFAULT_THROTTLE_MINUTES = 60
+DEFAULT_DIGEST_MINUTES = 6 * 60
+LOGIN_URL = "https://www.trustedhousesitters.com/login/"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# --- Session cache (kept out of git; persisted between CI runs with actions/cache) ---
+CACHE_DIR = ".cache"
+SESSION_STATE_PATH = ".cache/session/storage_state.json"
+SESSION_META_PATH = ".cache/session/meta.json"
+SESSION_MAX_AGE_HOURS = 72  # Log in again once the saved session is older than this
+HTTP_CACHE_DIR = ".cache/http"
+HTTP_CACHE_MAX_AGE_HOURS = 24
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+HTTP_CACHE_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+STRATEGY_REGISTRY_PATH = ".cache/strategies.json"
+SEEN_INDEX_PATH = ".cache/seen_index.bin"
+CHECKPOINT_DIR = ".cache/checkpoints"
+CHECKPOINT_MAX_AGE_HOURS = 2  # Older checkpoints are discarded rather than resumed
+QUERY_RETRIES = 1
+SPLIT_CONCURRENCY = 3  # Sub-window searches of one split query that run at the same time
+SPLIT_OVERLAP_DAYS = 60  # Sub-window searches reach this far past the window, to catch sits crossing its end
+CALL_PROFILE_PATH = "debug/calls.pstats"
+CALL_FOLDED_PATH = "debug/calls.folded"
+PROFILED_PAGE_METHODS = ["goto", "content", "screenshot", "wait_for_selector", "wait_for_url"]
+PROFILED_LOCATOR_METHODS = ["all", "count", "click", "fill", "text_content", "get_attribute", "input_value",
+                            "is_visible", "is_enabled", "wait_for", "scroll_into_view_if_needed"]
+LATENCY_PATH = ".cache/latency.json"
+LATENCY_WINDOW = 200  # Samples kept per operation type
+LATENCY_MIN_SAMPLES = 10
+TIMEOUT_PERCENTILE = 0.95
+TIMEOUT_SAFETY_FACTOR = 3
+TIMEOUT_BACKOFF_AFTER = 3  # Consecutive timeouts of one type before its timeout starts doubling
+TIMEOUT_NO_BACKOFF = {'strategy'}  # Failing fallback strategies are expected, not a sign of a slow site
+TIMEOUT_BOUNDS = {  # op: (default_ms, floor_ms, ceiling_ms)
+    'goto': (120000, 15000, 180000),
+    'click': (20000, 3000, 30000),
+    'selector': (30000, 5000, 60000),
+    'field': (1000, 300, 5000),
+    'probe': (5000, 1000, 10000),
+    'strategy': (5000, 1000, 10000),  # A whole selector strategy attempt, human-like waits included
+    'screenshot': (30000, 5000, 60000),
+}
+WATCHDOG_INTERVAL_SECONDS = 2
+WATCHDOG_SLACK_SECONDS = 10
+RUN_BUDGET_SECONDS = 8 * 60  # Keep the whole run inside the 10 minute cron slot
+PROBE_TIMEOUT_MS = 1500  # Short first-pass timeout for each selector strategy
+FULL_MONTH_NAMES = {"Jan": "January", "Feb": "February", "Mar": "March", "Apr": "April",
+                    "May": "May", "Jun": "June", "Jul": "July", "Aug": "August",
+                    "Sep": "September", "Oct": "October", "Nov": "November", "Dec": "December"}
 
 
 # --- Utility functions ---
@@ -52,14 +141,225 @@ async def wait_like_human(min_sec=0.2, max_sec=0.5):
     await asyncio.sleep(random.uniform(min_sec, max_sec))
 
 
-async def safe_screenshot(page, path, timeout=30000, **kwargs):
+async def safe_screenshot(page, path, timeout=None, **kwargs):
     """Take a screenshot with error handling to prevent crashes"""
     try:
-        await page.screenshot(path=path, timeout=timeout, **kwargs)
+        await timed('screenshot', page.screenshot(path=path, timeout=timeout or timeout_for('screenshot'), **kwargs))
     except Exception as e:
         logging.warning(f"Failed to take screenshot {path}: {e}")
 
 
+# --- Call profiling ---
+# Opt-in (--profile-calls): Page/Locator coroutine methods and wait_like_human are wrapped
+# to count calls and time spent per (operation, calling stack within this file). Results
+# go to a pstats-compatible file and a folded-stack file for flame graphs.
+_call_stats = {}  # (op, stack of (file, line, function)) -> [calls, seconds]
+_profile_units = {'pages': 0, 'cards': 0}
+_PROFILE_SKIP_FRAMES = {'profiled', 'timed'}  # wrappers; attribute time to whoever called them
+
+
+def _scraper_stack(frame) -> tuple:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__ and code.co_name not in _PROFILE_SKIP_FRAMES:
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _profiled(op: str, fn):
+    @functools.wraps(fn)
+    async def profiled(*args, **kwargs):
+        stack = _scraper_stack(sys._getframe(1))
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            entry = _call_stats.setdefault((op, stack), [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+    return profiled
+
+
+def enable_call_profiling() -> None:
+    global wait_like_human
+    from playwright.async_api import Page, Locator
+    for cls, names in ((Page, PROFILED_PAGE_METHODS), (Locator, PROFILED_LOCATOR_METHODS)):
+        for name in names:
+            setattr(cls, name, _profiled(f"{cls.__name__}.{name}", getattr(cls, name)))
+    wait_like_human = _profiled("sleep", wait_like_human)
+    logging.info("Call profiling enabled")
+
+
+def write_call_profile() -> None:
+    """Write the collected call stats as pstats and folded stacks, and log the hot spots"""
+    if not _call_stats:
+        return
+    stats = {}
+
+    def add(func, caller, calls, seconds, own):
+        cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+        stats[func] = (cc + calls, nc + calls, tt + (seconds if own else 0.0), ct + seconds, callers)
+        if caller is not None:
+            c = callers.get(caller, (0, 0, 0.0, 0.0))
+            callers[caller] = (c[0] + calls, c[1] + calls, c[2] + (seconds if own else 0.0), c[3] + seconds)
+
+    folded = []
+    per_op = {}
+    for (op, stack), (calls, seconds) in _call_stats.items():
+        op_key = ('~playwright', 0, op)
+        add(op_key, stack[-1] if stack else None, calls, seconds, own=True)
+        # Attribute the time to every function on the stack so cumulative times add up the tree
+        for depth, func in enumerate(stack):
+            add(func, stack[depth - 1] if depth else None, 0, seconds, own=False)
+        folded.append(f"{';'.join(f[2] for f in stack + (op_key,))} {int(seconds * 1e6)}")
+        caller = stack[-1][2] if stack else '?'
+        totals = per_op.setdefault((op, caller), [0, 0.0])
+        totals[0] += calls
+        totals[1] += seconds
+
+    with open(CALL_PROFILE_PATH, 'wb') as f:
+        marshal.dump(stats, f)
+    with open(CALL_FOLDED_PATH, 'w') as f:
+        f.write("\n".join(sorted(folded)) + "\n")
+
+    total_calls = sum(calls for op, (calls, _) in ((k[0], v) for k, v in per_op.items()) if op != 'sleep')
+    lines = [f"{'calls':>7} {'total s':>9} {'avg ms':>8}  operation <- caller"]
+    for (op, caller), (calls, seconds) in sorted(per_op.items(), key=lambda kv: -kv[1][1])[:20]:
+        lines.append(f"{calls:>7} {seconds:>9.2f} {seconds / calls * 1000:>8.1f}  {op} <- {caller}")
+    if _profile_units['cards']:
+        lines.append(f"{total_calls} browser calls over {_profile_units['pages']} pages and {_profile_units['cards']} "
+                     f"cards ({total_calls / _profile_units['cards']:.1f} per card)")
+    logging.info("Call profile (hottest first):\n" + "\n".join(lines))
+    logging.info(f"Wrote {CALL_PROFILE_PATH} (pstats) and {CALL_FOLDED_PATH} (folded stacks)")
+
+
+# --- Latency tracking ---
+# Browser operations are timed per type; each type's timeout is a high percentile of its
+# recent latencies times a safety factor, clamped to sane bounds and persisted between
+# runs. Until enough samples exist the old fixed timeouts (the defaults) apply.
+# Timed-out operations leave no sample, so if the site slows down past a learned timeout,
+# consecutive timeouts of a type double its timeout (up to the ceiling) until one succeeds.
+_latency_samples = None
+_timeout_streaks = {}  # op: consecutive timeouts
+_run_started = time.monotonic()
+_heartbeat = contextvars.ContextVar('heartbeat', default=None)
+
+
+class WatchdogTimeout(Exception):
+    pass
+
+
+def _load_latency_samples() -> dict:
+    global _latency_samples
+    if _latency_samples is None:
+        try:
+            with open(LATENCY_PATH, 'r') as f:
+                _latency_samples = json.load(f)
+        except Exception:
+            _latency_samples = {}
+    return _latency_samples
+
+
+def save_latency_stats() -> None:
+    if _latency_samples is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(LATENCY_PATH), exist_ok=True)
+        with open(LATENCY_PATH, 'w') as f:
+            json.dump(_latency_samples, f)
+    except Exception as e:
+        logging.warning(f"Failed to save latency stats: {e}")
+    summary = ", ".join(f"{op} p50={latency_percentile(op, 0.5):.0f}ms timeout={timeout_for(op)}ms"
+                        for op in TIMEOUT_BOUNDS if _latency_samples.get(op))
+    logging.info(f"Observed latencies: {summary or 'none'}")
+
+
+def record_latency(op: str, ms: float) -> None:
+    samples = _load_latency_samples().setdefault(op, [])
+    samples.append(round(ms, 1))
+    del samples[:-LATENCY_WINDOW]
+
+
+def latency_percentile(op: str, q: float) -> float:
+    samples = sorted(_load_latency_samples().get(op, []))
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def timeout_for(op: str) -> int:
+    """Timeout in ms for an operation type, derived from its observed latencies"""
+    default, floor, ceiling = TIMEOUT_BOUNDS[op]
+    timeout = default
+    if len(_load_latency_samples().get(op, [])) >= LATENCY_MIN_SAMPLES:
+        timeout = max(floor, latency_percentile(op, TIMEOUT_PERCENTILE) * TIMEOUT_SAFETY_FACTOR)
+    streak = _timeout_streaks.get(op, 0)
+    if streak >= TIMEOUT_BACKOFF_AFTER:
+        timeout *= 2 ** (streak - TIMEOUT_BACKOFF_AFTER + 1)
+    return int(min(ceiling, max(floor, timeout)))
+
+
+async def timed(op: str, awaitable):
+    """Await a browser operation, recording its latency and beating the watchdog heartbeat"""
+    start = time.perf_counter()
+    try:
+        result = await awaitable
+    except Exception as e:
+        if type(e).__name__ == 'TimeoutError' and op not in TIMEOUT_NO_BACKOFF:  # Playwright's and asyncio's alike
+            _timeout_streaks[op] = _timeout_streaks.get(op, 0) + 1
+            if _timeout_streaks[op] == TIMEOUT_BACKOFF_AFTER:
+                logging.warning(f"{TIMEOUT_BACKOFF_AFTER} '{op}' timeouts in a row, raising its timeout")
+        raise
+    _timeout_streaks[op] = 0
+    record_latency(op, (time.perf_counter() - start) * 1000)
+    heartbeat = _heartbeat.get()
+    if heartbeat is not None:
+        heartbeat['at'] = time.monotonic()
+    return result
+
+
+def stall_budget_seconds() -> float:
+    """How long a page may go without any browser operation completing before it counts as stalled"""
+    return max(timeout_for(op) for op in TIMEOUT_BOUNDS) / 1000 + WATCHDOG_SLACK_SECONDS
+
+
+async def run_with_watchdog(coro, budget_seconds: float):
+    """Run `coro` as a task, cancelling it if it stalls or overruns `budget_seconds`"""
+    heartbeat = {'at': time.monotonic()}
+    token = _heartbeat.set(heartbeat)
+    try:
+        task = asyncio.ensure_future(coro)
+    finally:
+        _heartbeat.reset(token)
+    start = time.monotonic()
+    stall_seconds = stall_budget_seconds()
+    while True:
+        await asyncio.wait({task}, timeout=WATCHDOG_INTERVAL_SECONDS)
+        if task.done():
+            return task.result()
+        now = time.monotonic()
+        if now - heartbeat['at'] > stall_seconds or now - start > budget_seconds:
+            reason = (f"no progress for {now - heartbeat['at']:.0f}s" if now - heartbeat['at'] > stall_seconds
+                      else f"over budget of {budget_seconds:.0f}s")
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            raise WatchdogTimeout(reason)
+
+
+def start_run_clock() -> None:
+    global _run_started
+    _run_started = time.monotonic()
+
+
+def run_time_left() -> float:
+    return RUN_BUDGET_SECONDS - (time.monotonic() - _run_started)
+
+
 def normalize_pet(pet: str) -> str:
     pet = pet.lower().strip().replace("small pet", "small_pets")
     return pet.replace(" ", "_")
@@ -86,8 +386,9 @@ async def extract_pets(card) -> dict:
         return counts
     for it in items:
         try:
-            cnt = await it.locator('span[data-testid="Animal__count"]').text_content(timeout=1000)
-            ptype = await it.locator('svg title').text_content(timeout=1000)
+            cnt = await timed('field', it.locator('span[data-testid="Animal__count"]').text_content(
+                timeout=timeout_for('field')))
+            ptype = await timed('field', it.locator('svg title').text_content(timeout=timeout_for('field')))
             key = normalize_pet(ptype)
             if key in counts:
                 counts[key] += int(cnt.strip())
@@ -96,6 +397,26 @@ async def extract_pets(card) -> dict:
     return counts
 
 
+def normalize_content_value(col: str, value):
+    """Canonical form of a content field, so values survive CSV/JSON round-trips and dtype drift unchanged"""
+    if isinstance(value, float) and value != value:
+        value = None
+    if col in PET_TYPES:
+        try:
+            return int(value or 0)
+        except (TypeError, ValueError):
+            return 0
+    if col == 'reviewing':
+        return bool(value)
+    return '' if value is None else str(value).strip()
+
+
+def listing_fingerprint(row: dict) -> str:
+    """Stable hash of a listing's content fields"""
+    values = [normalize_content_value(col, row.get(col)) for col in CONTENT_COLS]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
 def listing_id_from_url(url: str) -> str:
     m = re.search(r'/l/(\d+)(?:/|$)', url)
     return m.group(1) if m else url
@@ -133,6 +454,10 @@ def load_profiles() -> dict:
 
 
 # --- Telegram functions ---
+def _yes_no(value) -> str:
+    return 'Unknown' if value is None else ('Yes' if value else 'No')
+
+
 def format_telegram_message(rows: list[dict], profile_config: dict) -> list[str]:
     chunks = []
     header = profile_config.get("notification", {}).get("header", "🔔 New Listings")
@@ -153,8 +478,8 @@ def format_telegram_message(rows: list[dict], profile_config: dict) -> list[str]
             if row.get('reviewing'):
                 lines.append(f"   📝 Reviewing applications")
             # New fields: transport & car
-            lines.append(f"   🚗 Car included: {'Yes' if row.get('car_included') else 'No'}")
-            lines.append(f"   🚌 Public transport: {'Yes' if row.get('public_transport') else 'No'}")
+            lines.append(f"   🚗 Car included: {_yes_no(row.get('car_included'))}")
+            lines.append(f"   🚌 Public transport: {_yes_no(row.get('public_transport'))}")
             # Link
             lines.append(f"   🔗 [View listing]({row['url']})")
             lines.append("")
@@ -162,12 +487,15 @@ def format_telegram_message(rows: list[dict], profile_config: dict) -> list[str]
     return chunks
 
 
-def send_telegram_message(chunks: list[str]) -> None:
+def send_telegram_message(chunks: list[str]) -> bool:
+    """Send the chunks as separate messages; returns whether every part went out"""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         logging.warning("Telegram credentials not set. Skipping notification.")
-        return
+        return False
 
+    import requests
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    sent = True
     for part, chunk in enumerate(chunks, start=1):
         logging.info(f"Sending part {part}/{len(chunks)} (len={len(chunk)})")
         logging.debug(f"Preview: {chunk[:200]}{'…' if len(chunk) > 200 else ''}")
@@ -180,14 +508,576 @@ def send_telegram_message(chunks: list[str]) -> None:
             })
             if res.status_code != 200:
                 logging.error(f"Failed part {part}: {res.text}\n{chunk}")
+                sent = False
         except Exception:
             logging.exception(f"Telegram exception part {part}")
+            sent = False
+    return sent
+
+
+# --- Notifications ---
+# Alerts go out through one or more channels per profile ("notification": {"channels": [...]},
+# default ["telegram"]); a channel is a type name or a dict like {"type": "file", "path": ...}.
+# "delivery" picks when they are sent:
+#   immediate  every run's new listings straight away (the default)
+#   throttled  at most once per "throttle_minutes"; listings in between wait in the buffer
+#   digest     coalesced and sent as one message once the oldest has waited "digest_minutes"
+# Pending listings are kept per profile and channel in NOTIFY_BUFFER_PATH, which is committed
+# with the event log, so a failed send is retried on the next run instead of being lost.
+# A channel that isn't configured (e.g. no Telegram credentials locally) is skipped instead.
+class Notifier(abc.ABC):
+    """A delivery channel; send() returns whether the whole message went out"""
+    max_message_chars = None  # Longer messages are split at listing boundaries
+
+    def configured(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def send(self, subject: str, chunks: list[str]) -> bool:
+        ...
+
+
+class TelegramNotifier(Notifier):
+    max_message_chars = 4096
+
+    def configured(self):
+        return bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+    def send(self, subject, chunks):
+        return send_telegram_message(chunks)
+
+
+class SmtpNotifier(Notifier):
+    def __init__(self, host=None, port=None, sender=None, to=None):
+        self.host, self.port = host or SMTP_HOST, int(port or SMTP_PORT)
+        self.sender, self.to = sender or SMTP_FROM, to or SMTP_TO
+
+    def send(self, subject, chunks):
+        import smtplib
+        from email.message import EmailMessage
+        msg = EmailMessage()
+        msg['Subject'], msg['From'], msg['To'] = subject, self.sender, self.to
+        msg.set_content("\n".join(chunks))
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                smtp.send_message(msg)
+            return True
+        except Exception as e:
+            logging.error(f"SMTP delivery to {self.host}:{self.port} failed: {e}")
+            return False
+
+
+class WebhookNotifier(Notifier):
+    def __init__(self, url=None):
+        self.url = url or WEBHOOK_URL
+
+    def configured(self):
+        return bool(self.url)
+
+    def send(self, subject, chunks):
+        import requests
+        try:
+            res = requests.post(self.url, json={'subject': subject, 'text': "\n".join(chunks)}, timeout=10)
+            if res.status_code >= 300:
+                logging.error(f"Webhook returned {res.status_code}: {res.text[:200]}")
+                return False
+            return True
+        except Exception as e:
+            logging.error(f"Webhook delivery failed: {e}")
+            return False
+
+
+class FileNotifier(Notifier):
+    """Appends each message to a JSON-lines file; for local runs and tests"""
+    def __init__(self, path=None):
+        self.path = path or NOTIFY_FILE_PATH
+
+    def send(self, subject, chunks):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(json.dumps({'sent_at': datetime.now(timezone.utc).isoformat(), 'subject': subject,
+                                    'text': chunk}, ensure_ascii=False) + "\n")
+        return True
+
+
+NOTIFIER_TYPES = {'telegram': TelegramNotifier, 'smtp': SmtpNotifier, 'webhook': WebhookNotifier,
+                  'file': FileNotifier}
+
+
+def profile_channels(profile_config: dict) -> dict:
+    """The profile's notifiers keyed by channel name"""
+    if NOTIFY_CHANNELS:
+        specs = [name.strip() for name in NOTIFY_CHANNELS.split(",") if name.strip()]
+    else:
+        specs = profile_config.get("notification", {}).get("channels", ["telegram"])
+    channels = {}
+    for spec in specs:
+        spec = {'type': spec} if isinstance(spec, str) else dict(spec)
+        kind = spec.pop('type')
+        name = spec.pop('name', kind)
+        if kind not in NOTIFIER_TYPES:
+            logging.error(f"Unknown notification channel type {kind!r}")
+            continue
+        channels[name] = NOTIFIER_TYPES[kind](**spec)
+    return channels
+
+
+def pack_chunks(chunks: list[str], limit: int | None) -> list[str]:
+    """Join message chunks into as few messages as the channel's size limit allows"""
+    packed = []
+    for chunk in chunks:
+        if packed and (limit is None or len(packed[-1]) + 1 + len(chunk) <= limit):
+            packed[-1] += "\n" + chunk
+        else:
+            packed.append(chunk)
+    return packed
+
+
+def load_notify_buffer() -> dict:
+    try:
+        with open(NOTIFY_BUFFER_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error(f"Unreadable notification buffer {NOTIFY_BUFFER_PATH}, starting empty: {e}")
+        return {}
+
+
+def save_notify_buffer(buffer: dict) -> None:
+    os.makedirs(os.path.dirname(NOTIFY_BUFFER_PATH), exist_ok=True)
+    with open(NOTIFY_BUFFER_PATH + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(buffer, f, ensure_ascii=False, indent=1, sort_keys=True, default=str)
+    os.replace(NOTIFY_BUFFER_PATH + ".tmp", NOTIFY_BUFFER_PATH)
+
+
+def notification_due(entry: dict, notification: dict, now: datetime) -> bool:
+    delivery = notification.get("delivery", "immediate")
+    if delivery == "throttled":
+        last_sent = entry.get('last_sent')
+        interval = timedelta(minutes=notification.get("throttle_minutes", DEFAULT_THROTTLE_MINUTES))
+        return last_sent is None or now - datetime.fromisoformat(last_sent) >= interval
+    if delivery == "digest":
+        window = timedelta(minutes=notification.get("digest_minutes", DEFAULT_DIGEST_MINUTES))
+        return now - datetime.fromisoformat(entry['since']) >= window
+    return True
+
+
+def deliver_notifications(profiles: dict, alerts: list[tuple[str, list[dict]]], force=False, now=None) -> int:
+    """Queue new listings per profile and channel, then send whatever is due; returns messages sent.
+
+    force sends everything pending regardless of the profile's delivery schedule.
+    """
+    now = now or datetime.now(timezone.utc)
+    buffer = load_notify_buffer()
+    for profile_name, rows in alerts:
+        for channel, notifier in profile_channels(profiles[profile_name]).items():
+            if not notifier.configured():
+                logging.warning(f"Channel {channel} is not configured, skipping {len(rows)} {profile_name} alerts")
+                continue
+            entry = buffer.setdefault(profile_name, {}).setdefault(channel, {'pending': []})
+            queued = {r['unique_key'] for r in entry['pending']}
+            entry['pending'] += [r for r in rows if r['unique_key'] not in queued]
+            entry.setdefault('since', now.isoformat())
+
+    sent = 0
+    for profile_name, channel_entries in buffer.items():
+        profile_config = profiles.get(profile_name)
+        if profile_config is None:
+            continue  # Profile was removed; keep its backlog rather than drop it silently
+        notification = profile_config.get("notification", {})
+        channels = profile_channels(profile_config)
+        for channel, entry in channel_entries.items():
+            if not entry['pending'] or channel not in channels:
+                continue
+            if not channels[channel].configured():
+                logging.warning(f"Channel {channel} is not configured, dropping {len(entry['pending'])} "
+                                f"pending {profile_name} alerts")
+                entry['pending'] = []
+                entry.pop('since', None)
+                continue
+            if not force and not notification_due(entry, notification, now):
+                logging.info(f"Holding {len(entry['pending'])} {profile_name} alerts for {channel} "
+                             f"({notification.get('delivery')})")
+                continue
+            notifier = channels[channel]
+            rows = entry['pending']
+            chunks = format_telegram_message(rows, profile_config)
+            if notification.get("delivery", "immediate") != "immediate":
+                chunks = pack_chunks(chunks, notifier.max_message_chars)
+            subject = f"{len(rows)} new {profile_name} listings"
+            logging.info(f"Sending {len(rows)} {profile_name} alerts via {channel} in {len(chunks)} messages")
+            if notifier.send(subject, chunks):
+                sent += len(chunks)
+                channel_entries[channel] = {'pending': [], 'last_sent': now.isoformat()}
+            else:
+                logging.warning(f"Delivery via {channel} failed; {len(rows)} {profile_name} alerts stay pending")
+    save_notify_buffer(buffer)
+    return sent
+
+
+# --- Browser session ---
+_http_cache_stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+
+
+def load_session_meta() -> dict:
+    try:
+        with open(SESSION_META_PATH, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_session_meta(meta: dict) -> None:
+    os.makedirs(os.path.dirname(SESSION_META_PATH), exist_ok=True)
+    with open(SESSION_META_PATH + ".tmp", 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(SESSION_META_PATH + ".tmp", SESSION_META_PATH)
+
+
+def _http_cache_paths(url: str) -> tuple[str, str]:
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    base = os.path.join(HTTP_CACHE_DIR, digest[:2], digest)
+    return base + ".body", base + ".json"
+
+
+async def _serve_from_http_cache(route):
+    """Route handler that serves static assets from the on-disk cache, filling it on a miss"""
+    request = route.request
+    if request.method != "GET" or request.resource_type not in HTTP_CACHE_RESOURCE_TYPES:
+        await route.continue_()
+        return
+
+    body_path, meta_path = _http_cache_paths(request.url)
+    try:
+        if os.path.exists(meta_path) and time.time() - os.path.getmtime(meta_path) < HTTP_CACHE_MAX_AGE_HOURS * 3600:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            _http_cache_stats['hits'] += 1
+            _http_cache_stats['bytes_saved'] += len(body)
+            await route.fulfill(status=meta['status'], headers=meta['headers'], body=body)
+            return
+    except Exception as e:
+        logging.debug(f"HTTP cache read failed for {request.url}: {e}")
+
+    try:
+        response = await route.fetch()
+    except Exception:
+        await route.continue_()
+        return
+    _http_cache_stats['misses'] += 1
+    if response.status == 200:
+        try:
+            body = await response.body()
+            # The body is stored decoded, so drop headers describing the wire encoding
+            headers = {k: v for k, v in response.headers.items()
+                       if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            with open(body_path, 'wb') as f:
+                f.write(body)
+            with open(meta_path, 'w') as f:
+                json.dump({'status': response.status, 'headers': headers}, f)
+        except Exception as e:
+            logging.debug(f"HTTP cache write failed for {request.url}: {e}")
+    await route.fulfill(response=response)
+
+
+def prune_http_cache() -> None:
+    """Drop the least recently written cache entries once the cache exceeds HTTP_CACHE_MAX_BYTES"""
+    if not os.path.isdir(HTTP_CACHE_DIR):
+        return
+    entries = []
+    for root, _, files in os.walk(HTTP_CACHE_DIR):
+        for name in files:
+            if name.endswith(".body"):
+                path = os.path.join(root, name)
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= HTTP_CACHE_MAX_BYTES:
+            break
+        for p in (path, path[:-len(".body")] + ".json"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        total -= size
+
+
+async def dismiss_consent(page) -> bool:
+    """Accept the cookie banner if it is showing"""
+    try:
+        button = page.locator('#onetrust-accept-btn-handler').or_(
+            page.get_by_role("button", name=re.compile(r"^Accept( all)?( cookies)?$", re.IGNORECASE)))
+        await button.first.click(timeout=5000)
+        logging.info("Accepted cookie consent banner")
+        return True
+    except Exception:
+        return False
+
+
+async def login(page) -> bool:
+    """Log in with THS_EMAIL / THS_PASSWORD"""
+    try:
+        await timed('goto', page.goto(LOGIN_URL, wait_until='domcontentloaded', timeout=timeout_for('goto')))
+        await dismiss_consent(page)
+        await page.get_by_label(re.compile("email", re.IGNORECASE)).first.fill(THS_EMAIL, timeout=20000)
+        await page.get_by_label(re.compile("password", re.IGNORECASE)).first.fill(THS_PASSWORD, timeout=20000)
+        await wait_like_human()
+        await page.get_by_role("button", name=re.compile(r"^log ?in$", re.IGNORECASE)).first.click(timeout=20000)
+        await page.wait_for_url(lambda url: "/login" not in url, timeout=30000)
+        logging.info("Logged in to TrustedHousesitters")
+        return True
+    except Exception as e:
+        logging.warning(f"Login failed, continuing without an account session: {e}")
+        await safe_screenshot(page, "debug/error_login.png")
+        return False
+
+
+async def open_session(p):
+    """Launch the browser with the saved storage state and HTTP cache, logging in or accepting consent only when needed"""
+    browser = await p.chromium.launch(headless=HEADLESS)
+    restored = os.path.exists(SESSION_STATE_PATH)
+    context_options = dict(user_agent=USER_AGENT, viewport={'width': 1280, 'height': 800}, locale='en-US')
+    try:
+        ctx = await browser.new_context(**context_options, storage_state=SESSION_STATE_PATH if restored else None)
+    except Exception as e:
+        # A damaged saved state must not break every later run; start fresh and overwrite it
+        logging.warning(f"Could not restore browser session from {SESSION_STATE_PATH}, starting a new one: {e}")
+        restored = False
+        ctx = await browser.new_context(**context_options)
+    await ctx.add_init_script("Object.defineProperty(navigator,'webdriver',{get:()=>undefined})")
+    await ctx.route("**/*", _serve_from_http_cache)
+
+    meta = load_session_meta() if restored else {}
+    session_age = time.time() - meta.get('logged_in_at', 0)
+    needs_login = bool(THS_EMAIL and THS_PASSWORD) and (
+        meta.get('logged_in_as') != THS_EMAIL or session_age > SESSION_MAX_AGE_HOURS * 3600)
+    logging.info(f"Browser session: restored={restored}, consent={meta.get('consent', False)}, login={needs_login}")
+
+    if needs_login or not meta.get('consent'):
+        page = await ctx.new_page()
+        try:
+            if needs_login:
+                if await login(page):
+                    meta.update(logged_in_as=THS_EMAIL, logged_in_at=time.time(), consent=True)
+            if not meta.get('consent'):
+                await timed('goto', page.goto(BASE_URL, wait_until='domcontentloaded', timeout=timeout_for('goto')))
+                await dismiss_consent(page)
+                meta['consent'] = True  # No banner shown means there is nothing left to accept
+        except Exception as e:
+            logging.warning(f"Session warm-up failed: {e}")
+        finally:
+            await page.close()
+        await save_session(ctx, meta)
+    return browser, ctx
+
+
+async def save_session(ctx, meta: dict | None = None) -> None:
+    try:
+        os.makedirs(os.path.dirname(SESSION_STATE_PATH), exist_ok=True)
+        state = await ctx.storage_state()
+        with open(SESSION_STATE_PATH + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(SESSION_STATE_PATH + ".tmp", SESSION_STATE_PATH)
+        if meta is not None:
+            save_session_meta(meta)
+    except Exception as e:
+        logging.warning(f"Failed to save browser session: {e}")
+
+
+async def close_session(browser, ctx) -> None:
+    await save_session(ctx)
+    save_latency_stats()
+    await browser.close()
+    prune_http_cache()
+    logging.info(f"HTTP cache: {_http_cache_stats['hits']} hits, {_http_cache_stats['misses']} misses, "
+                 f"{_http_cache_stats['bytes_saved'] / 1024:.0f} KiB served from disk")
+
+
+# --- Selector strategies ---
+# Steps with several ways of locating an element keep their strategies in order of
+# preference: the precise ones first, looser fallbacks (which can match the wrong option
+# or day) after. The registry learns which strategies keep failing so their quick probe
+# is skipped, retrying it now and then. Only steps whose strategies are interchangeable
+# also move the last winner to the front.
+STRATEGY_SKIP_AFTER = 3  # Consecutive failures before a strategy's probe is skipped
+STRATEGY_RETRY_EVERY = 10  # ...except on every Nth attempt, in case it works again
+_strategy_registry = None
+
+
+def load_strategy_registry() -> dict:
+    global _strategy_registry
+    if _strategy_registry is None:
+        try:
+            with open(STRATEGY_REGISTRY_PATH, 'r') as f:
+                _strategy_registry = json.load(f)
+        except Exception:
+            _strategy_registry = {}
+    return _strategy_registry
+
+
+def _strategy_entry(step: str) -> dict:
+    entry = load_strategy_registry().setdefault(step, {'winner': None, 'wins': {}})
+    entry.setdefault('failures', {})
+    return entry
+
+
+def record_strategy_win(step: str, name: str) -> None:
+    entry = _strategy_entry(step)
+    entry['winner'] = name
+    entry['wins'][name] = entry['wins'].get(name, 0) + 1
+    entry['failures'][name] = 0
+    save_strategy_registry()
+
+
+def save_strategy_registry() -> None:
+    registry = load_strategy_registry()
+    try:
+        os.makedirs(os.path.dirname(STRATEGY_REGISTRY_PATH), exist_ok=True)
+        with open(STRATEGY_REGISTRY_PATH, 'w') as f:
+            json.dump(registry, f, indent=2)
+    except Exception as e:
+        logging.warning(f"Failed to save strategy registry: {e}")
 
 
 # --- Browser interactions ---
+async def run_strategies(step: str, strategies: list, timeout: int = 5000, interchangeable=False) -> str:
+    """Run the first strategy for `step` that works, in the given order of preference.
+
+    Each strategy is a (name, attempt) pair where `attempt(timeout)` raises on failure.
+    A quick pass with PROBE_TIMEOUT_MS runs before the full-timeout pass; strategies that
+    keep failing are left out of the quick pass. With `interchangeable`, all strategies
+    give the same result and the last winner is tried first.
+    """
+    entry = _strategy_entry(step)
+    ordered = strategies
+    if interchangeable:
+        ordered = sorted(strategies, key=lambda s: s[0] != entry['winner'])
+    probe_timeout = min(PROBE_TIMEOUT_MS, timeout)
+
+    for attempt_timeout in dict.fromkeys((probe_timeout, timeout)):
+        for name, attempt in ordered:
+            failures = entry['failures'].get(name, 0)
+            if (attempt_timeout == probe_timeout < timeout and failures >= STRATEGY_SKIP_AFTER
+                    and failures % STRATEGY_RETRY_EVERY):
+                entry['failures'][name] = failures + 1
+                continue
+            try:
+                await timed('strategy', attempt(attempt_timeout))
+            except Exception as e:
+                logging.warning(f"{step}: strategy '{name}' failed with {attempt_timeout}ms timeout: {e}")
+                if attempt_timeout == probe_timeout:
+                    entry['failures'][name] = failures + 1
+                continue
+            record_strategy_win(step, name)
+            logging.info(f"{step}: strategy '{name}' succeeded")
+            return name
+    save_strategy_registry()
+    raise Exception(f"All strategies failed for {step}")
+
+
+async def select_location_option(page, location: str) -> None:
+    """Click the dropdown option for `location`, preferring continent options"""
+    continent = page.get_by_text(re.compile(rf'.*{location}.*continent.*', re.IGNORECASE)).first
+
+    async def click_first(locator, timeout, force=True):
+        await locator.wait_for(timeout=timeout)
+        await locator.click(timeout=timeout, force=force)
+
+    async def continent_scrolled(timeout):
+        await continent.wait_for(timeout=timeout)
+        await continent.scroll_into_view_if_needed(timeout=timeout)
+        await wait_like_human(0.5, 1.0)
+        await continent.click(timeout=timeout)
+
+    # Let the dropdown render first so short probes don't skip past the preferred continent option
+    try:
+        await timed('click', page.get_by_text(re.compile(rf'.*{location}.*', re.IGNORECASE)).first.wait_for(
+            timeout=timeout_for('click')))
+    except Exception as e:
+        logging.warning(f"No dropdown option for {location} appeared: {e}")
+
+    await run_strategies("location_option", [
+        ("continent", lambda t: click_first(continent, t)),
+        ("continent_scrolled", continent_scrolled),
+        ("exact", lambda t: click_first(page.get_by_text(location, exact=True).first, t)),
+        ("partial", lambda t: click_first(page.get_by_text(re.compile(rf'.*{location}.*', re.IGNORECASE)).first, t)),
+    ], timeout=timeout_for('click'))
+
+
+async def navigate_calendar_to(page, month: str, year: str, label: str) -> None:
+    """Page the date picker forward until `month` `year` is showing"""
+    full_month = FULL_MONTH_NAMES.get(month, month)
+
+    async def click_enabled(locator, timeout):
+        if not await locator.is_enabled(timeout=timeout):
+            raise Exception("navigation button is disabled")
+        await locator.click(timeout=timeout)
+
+    async def next_button(timeout):
+        await click_enabled(page.locator('button:has-text(">")'), timeout)
+
+    async def next_svg_button(timeout):
+        await click_enabled(page.locator('[aria-label*="next"], [aria-label*="Next"], button:has(svg)').last, timeout)
+
+    async def generic_nav_button(timeout):
+        await click_enabled(page.locator('button').filter(has=page.locator('svg')).nth(1), timeout)
+
+    for i in range(15):  # Max 15 clicks to find the month
+        # Try full month name first since that's what the calendar shows, then the abbreviated format
+        for shown in (f"{full_month} {year}", f"{month} {year}"):
+            try:
+                if await page.locator(f'text={shown}').first.is_visible(timeout=1000):
+                    logging.info(f"Found {label} month {shown} after {i} clicks")
+                    return
+            except Exception as e:
+                logging.warning(f"Could not find {label} month {shown} on iteration {i}: {e}")
+
+        try:
+            await run_strategies("calendar_next", [
+                ("next_button", next_button),
+                ("next_svg_button", next_svg_button),
+                ("generic_nav_button", generic_nav_button),
+            ], timeout=timeout_for('strategy'), interchangeable=True)
+        except Exception:
+            # Leave it to the date selection to fail if the month really isn't showing
+            logging.error(f"Could not find any enabled navigation buttons on {label} month iteration {i}")
+            return
+        await wait_like_human()
+
+    logging.error(f"Could not find {label} month {month} {year} after 15 navigation attempts")
+    raise Exception(f"Could not navigate to {label} month {month} {year} - month may not be available on calendar")
+
+
+async def select_calendar_day(page, day: str, month: str, year: str, label: str) -> None:
+    """Click a day in the open date picker"""
+    date_obj = datetime.strptime(f"{day} {month} {year}", "%d %b %Y")
+    day_name = calendar.day_name[date_obj.weekday()]
+
+    async def click_first(locator, timeout):
+        await locator.click(timeout=timeout)
+
+    try:
+        await run_strategies("calendar_day", [
+            # The exact format from the recording, e.g. "27 Dec 2025 Saturday"
+            ("label_with_weekday", lambda t: click_first(page.get_by_label(f"{day} {month} {year} {day_name}"), t)),
+            ("label", lambda t: click_first(page.get_by_label(f"{day} {month} {year}"), t)),
+            ("day_button", lambda t: click_first(page.locator(f'button:has-text("{day}"):not([disabled])').first, t)),
+            ("role_button", lambda t: click_first(page.locator(f'[role="button"]:has-text("{day}")').first, t)),
+        ], timeout=timeout_for('strategy'))
+    except Exception:
+        logging.error(f"All {label} date selection methods failed for {day} {month} {year}")
+        raise Exception(f"Could not select {label} date {day} {month} {year} - date may not be available on calendar")
+    logging.info(f"Selected {label} date: {day} {month} {year} {day_name}")
+
+
 async def initial_search(page, profile_config) -> None:
     logging.info(f"Initial search setup for {profile_config['search']['location']}")
-    await page.goto(BASE_URL, wait_until='domcontentloaded', timeout=120000)
+    await timed('goto', page.goto(BASE_URL, wait_until='domcontentloaded', timeout=timeout_for('goto')))
     await wait_like_human()
 
     # Take a screenshot to help with debugging
@@ -196,9 +1086,9 @@ async def initial_search(page, profile_config) -> None:
     # Fill location using more reliable selector with timeout
     try:
         location_box = page.get_by_role("textbox", name="Search for a location")
-        await location_box.wait_for(timeout=20000)
+        await timed('click', location_box.wait_for(timeout=timeout_for('click')))
         location = profile_config["search"]["location"]
-        await location_box.click(timeout=20000)
+        await timed('click', location_box.click(timeout=timeout_for('click')))
         await location_box.fill(location)
         await wait_like_human()
         
@@ -208,56 +1098,7 @@ async def initial_search(page, profile_config) -> None:
         
         # Now click the location option that appears in dropdown, preferring continent options
         try:
-            selected = False
-            
-            # First try to find an option that mentions "continent" (case insensitive)
-            continent_options = page.get_by_text(re.compile(rf'.*{location}.*continent.*', re.IGNORECASE))
-            if await continent_options.count() > 0:
-                try:
-                    # Try different click methods to handle interception
-                    option = continent_options.first
-                    await option.click(timeout=20000, force=True)
-                    selected = True
-                    logging.info(f"Selected continent option for {location}")
-                except Exception as click_error:
-                    logging.warning(f"Force click failed for continent option: {click_error}")
-                    try:
-                        # Try scrolling into view and clicking
-                        await option.scroll_into_view_if_needed()
-                        await wait_like_human(0.5, 1.0)
-                        await option.click(timeout=20000)
-                        selected = True
-                        logging.info(f"Selected continent option for {location} after scroll")
-                    except Exception as scroll_error:
-                        logging.warning(f"Scroll+click failed for continent option: {scroll_error}")
-
-            if not selected:
-                # Fallback to first exact match if no continent option found
-                exact_options = page.get_by_text(location, exact=True)
-                if await exact_options.count() > 0:
-                    try:
-                        option = exact_options.first
-                        await option.click(timeout=20000, force=True)
-                        selected = True
-                        logging.info(f"Selected first exact match for {location}")
-                    except Exception as click_error:
-                        logging.warning(f"Exact match click failed: {click_error}")
-
-            if not selected:
-                # Final fallback to partial match
-                partial_options = page.get_by_text(re.compile(rf'.*{location}.*', re.IGNORECASE))
-                if await partial_options.count() > 0:
-                    try:
-                        option = partial_options.first
-                        await option.click(timeout=20000, force=True)
-                        selected = True
-                        logging.info(f"Selected first partial match for {location}")
-                    except Exception as click_error:
-                        logging.warning(f"Partial match click failed: {click_error}")
-
-            if not selected:
-                raise Exception(f"No matching option found or clickable for {location}")
-                
+            await select_location_option(page, location)
         except Exception as e:
             logging.error(f"All location selection methods failed: {e}")
             raise Exception(f"Location selection failed: {e}")
@@ -285,7 +1126,7 @@ async def initial_search(page, profile_config) -> None:
         is_enabled = await dates_button.is_enabled()
         logging.info(f"Dates button - visible: {is_visible}, enabled: {is_enabled}")
         
-        await dates_button.click(timeout=20000)
+        await timed('click', dates_button.click(timeout=timeout_for('click')))
         await wait_like_human()
         logging.info("Successfully clicked Dates button")
     except Exception as e:
@@ -303,264 +1144,18 @@ async def initial_search(page, profile_config) -> None:
     # Extract dates from config - following recorded pattern
     date_from = profile_config["search"]["date_from"]  # e.g., "27 Dec 2025"
     date_to = profile_config["search"]["date_to"]  # e.g., "15 Feb 2026"
-    
-    # Parse the dates
-    from_parts = date_from.split(" ")
-    from_day = from_parts[0] 
-    from_month = from_parts[1]
-    from_year = from_parts[2]
-    
-    to_parts = date_to.split(" ")
-    to_day = to_parts[0]
-    to_month = to_parts[1] 
-    to_year = to_parts[2]
-    
-    # Navigate to start month using chevron-right clicks (following recorded pattern)
-    for i in range(15):  # Max 15 clicks to find the month
-        # Check if we can see the target month/year in the calendar header (try multiple formats)
-        month_found = False
-        
-        # Try full month name first since that's what the calendar shows
-        full_month_names = {"Jan": "January", "Feb": "February", "Mar": "March", "Apr": "April", 
-                          "May": "May", "Jun": "June", "Jul": "July", "Aug": "August",
-                          "Sep": "September", "Oct": "October", "Nov": "November", "Dec": "December"}
-        full_month = full_month_names.get(from_month, from_month)
-        
-        try:
-            if await page.locator(f'text={full_month} {from_year}').first.is_visible(timeout=1000):
-                logging.info(f"Found start month {full_month} {from_year} after {i} clicks")
-                month_found = True
-        except Exception as e:
-            logging.warning(f"Could not find full month {full_month} {from_year} on iteration {i}: {e}")
-        
-        if not month_found:
-            try:
-                # Fallback to abbreviated format
-                if await page.locator(f'text={from_month} {from_year}').first.is_visible(timeout=1000):
-                    logging.info(f"Found start month {from_month} {from_year} after {i} clicks")
-                    month_found = True
-            except Exception as e:
-                logging.warning(f"Could not find abbreviated month {from_month} {from_year} on iteration {i}: {e}")
-        
-        if month_found:
-            break
-        # Try different selectors for the right arrow button with timeout and enabled check
-        navigation_successful = False
-        try:
-            next_button = page.locator('button:has-text(">")')
-            if await next_button.count() > 0 and await next_button.is_enabled():
-                await next_button.click(timeout=5000)
-                navigation_successful = True
-                logging.info(f"Clicked > button on iteration {i}")
-        except Exception as e:
-            logging.warning(f"Failed to click > button on iteration {i}: {e}")
-        
-        if not navigation_successful:
-            try:
-                # Look for right arrow or next button
-                next_buttons = page.locator('[aria-label*="next"], [aria-label*="Next"], button:has(svg)')
-                if await next_buttons.count() > 0:
-                    last_button = next_buttons.last
-                    if await last_button.is_enabled():
-                        await last_button.click(timeout=5000)
-                        navigation_successful = True
-                        logging.info(f"Clicked next/svg button on iteration {i}")
-            except Exception as e:
-                logging.warning(f"Failed to click next/svg button on iteration {i}: {e}")
-        
-        if not navigation_successful:
-            try:
-                # Last resort - generic navigation button
-                nav_buttons = page.locator('button').filter(has=page.locator('svg'))
-                if await nav_buttons.count() > 1:
-                    nav_button = nav_buttons.nth(1)
-                    if await nav_button.is_enabled():
-                        await nav_button.click(timeout=5000)
-                        navigation_successful = True
-                        logging.info(f"Clicked generic nav button on iteration {i}")
-            except Exception as e:
-                logging.warning(f"Failed to click generic nav button on iteration {i}: {e}")
-        
-        if not navigation_successful:
-            logging.error(f"Could not find any enabled navigation buttons on iteration {i}")
-            break  # Exit the loop if we can't navigate further
-        await wait_like_human()
-    else:
-        # This executes if the loop completes without breaking
-        logging.error(f"Could not find start month {from_month} {from_year} after 15 navigation attempts")
-        raise Exception(f"Could not navigate to start month {from_month} {from_year} - month may not be available on calendar")
-    
-    # Select start date using multiple fallback approaches
-    import calendar
-    from datetime import datetime
-    
-    date_selected = False
-    
-    # Try different date selection methods
-    try:
-        # Method 1: Try the exact format from recording "27 Dec 2025 Saturday"
-        date_obj = datetime.strptime(f"{from_day} {from_month} {from_year}", "%d %b %Y")
-        day_name = calendar.day_name[date_obj.weekday()]
-        await page.get_by_label(f"{from_day} {from_month} {from_year} {day_name}").click(timeout=5000)
-        logging.info(f"Selected start date: {from_day} {from_month} {from_year} {day_name}")
-        date_selected = True
-    except Exception as e:
-        logging.warning(f"Method 1 failed: {e}")
-    
-    if not date_selected:
-        try:
-            # Method 2: Simple format without day name
-            await page.get_by_label(f"{from_day} {from_month} {from_year}").click(timeout=5000)
-            logging.info(f"Selected start date: {from_day} {from_month} {from_year}")
-            date_selected = True
-        except Exception as e:
-            logging.warning(f"Method 2 failed: {e}")
-    
-    if not date_selected:
-        try:
-            # Method 3: Click on the day number directly in the calendar
-            await page.locator(f'button:has-text("{from_day}"):not([disabled])').first.click(timeout=5000)
-            logging.info(f"Selected start date by day number: {from_day}")
-            date_selected = True
-        except Exception as e:
-            logging.warning(f"Method 3 failed: {e}")
-    
-    if not date_selected:
-        try:
-            # Method 4: More generic calendar day selector
-            await page.locator(f'[role="button"]:has-text("{from_day}")').first.click(timeout=5000)
-            logging.info(f"Selected start date by role button: {from_day}")
-            date_selected = True
-        except Exception as e:
-            logging.warning(f"Method 4 failed: {e}")
-    
-    if not date_selected:
-        raise Exception(f"Could not select start date {from_day} {from_month} {from_year}")
-    
+    from_day, from_month, from_year = date_from.split(" ")
+    to_day, to_month, to_year = date_to.split(" ")
+
+    # Navigate to start month (following recorded pattern) and select the start date
+    await navigate_calendar_to(page, from_month, from_year, "start")
+    await select_calendar_day(page, from_day, from_month, from_year, "start")
     await wait_like_human()
     
-    # Navigate to end month if different (following recorded pattern)
+    # Navigate to end month if different and select the end date
     if from_month != to_month or from_year != to_year:
-        for i in range(15):  # Navigate to end month
-            # Check if we can see the target month/year in the calendar header (try multiple formats)
-            end_month_found = False
-            
-            # Try full month name first
-            full_to_month = full_month_names.get(to_month, to_month)
-            
-            try:
-                if await page.locator(f'text={full_to_month} {to_year}').first.is_visible(timeout=1000):
-                    logging.info(f"Found end month {full_to_month} {to_year} after {i} additional clicks")
-                    end_month_found = True
-            except Exception as e:
-                logging.warning(f"Could not find full end month {full_to_month} {to_year} on iteration {i}: {e}")
-            
-            if not end_month_found:
-                try:
-                    # Fallback to abbreviated format
-                    if await page.locator(f'text={to_month} {to_year}').first.is_visible(timeout=1000):
-                        logging.info(f"Found end month {to_month} {to_year} after {i} additional clicks")
-                        end_month_found = True
-                except Exception as e:
-                    logging.warning(f"Could not find abbreviated end month {to_month} {to_year} on iteration {i}: {e}")
-            
-            if end_month_found:
-                break
-                
-            # Try different selectors for the right arrow button with timeout and error handling
-            navigation_successful = False
-            try:
-                next_button = page.locator('button:has-text(">")')
-                if await next_button.count() > 0 and await next_button.is_enabled():
-                    await next_button.click(timeout=5000)
-                    navigation_successful = True
-                    logging.info(f"Clicked > button on end month iteration {i}")
-            except Exception as e:
-                logging.warning(f"Failed to click > button on end month iteration {i}: {e}")
-            
-            if not navigation_successful:
-                try:
-                    # Look for right arrow or next button
-                    next_buttons = page.locator('[aria-label*="next"], [aria-label*="Next"], button:has(svg)')
-                    if await next_buttons.count() > 0:
-                        last_button = next_buttons.last
-                        if await last_button.is_enabled():
-                            await last_button.click(timeout=5000)
-                            navigation_successful = True
-                            logging.info(f"Clicked next/svg button on end month iteration {i}")
-                except Exception as e:
-                    logging.warning(f"Failed to click next/svg button on end month iteration {i}: {e}")
-            
-            if not navigation_successful:
-                try:
-                    # Last resort - generic navigation button
-                    nav_buttons = page.locator('button').filter(has=page.locator('svg'))
-                    if await nav_buttons.count() > 1:
-                        nav_button = nav_buttons.nth(1)
-                        if await nav_button.is_enabled():
-                            await nav_button.click(timeout=5000)
-                            navigation_successful = True
-                            logging.info(f"Clicked generic nav button on end month iteration {i}")
-                except Exception as e:
-                    logging.warning(f"Failed to click generic nav button on end month iteration {i}: {e}")
-            
-            if not navigation_successful:
-                logging.error(f"Could not find any enabled navigation buttons on end month iteration {i}")
-                break  # Exit the loop if we can't navigate further
-                
-            await wait_like_human()
-        else:
-            # This executes if the loop completes without breaking
-            logging.error(f"Could not find end month {to_month} {to_year} after 15 navigation attempts")
-            raise Exception(f"Could not navigate to end month {to_month} {to_year} - month may not be available on calendar")
-    
-    # Select end date using multiple fallback approaches
-    end_date_selected = False
-    
-    try:
-        # Method 1: Try the exact format from recording
-        date_obj = datetime.strptime(f"{to_day} {to_month} {to_year}", "%d %b %Y")
-        day_name = calendar.day_name[date_obj.weekday()]
-        await page.get_by_label(f"{to_day} {to_month} {to_year} {day_name}").click(timeout=5000)
-        logging.info(f"Selected end date: {to_day} {to_month} {to_year} {day_name}")
-        end_date_selected = True
-    except Exception as e:
-        logging.warning(f"End date method 1 failed: {e}")
-    
-    if not end_date_selected:
-        try:
-            # Method 2: Simple format without day name
-            await page.get_by_label(f"{to_day} {to_month} {to_year}").click(timeout=5000)
-            logging.info(f"Selected end date: {to_day} {to_month} {to_year}")
-            end_date_selected = True
-        except Exception as e:
-            logging.warning(f"End date method 2 failed: {e}")
-    
-    if not end_date_selected:
-        try:
-            # Method 3: Click on the day number directly in the calendar
-            day_buttons = page.locator(f'button:has-text("{to_day}"):not([disabled])')
-            if await day_buttons.count() > 0:
-                await day_buttons.first.click(timeout=5000)
-                logging.info(f"Selected end date by day number: {to_day}")
-                end_date_selected = True
-        except Exception as e:
-            logging.warning(f"End date method 3 failed: {e}")
-    
-    if not end_date_selected:
-        try:
-            # Method 4: More generic calendar day selector
-            role_buttons = page.locator(f'[role="button"]:has-text("{to_day}")')
-            if await role_buttons.count() > 0:
-                await role_buttons.first.click(timeout=5000)
-                logging.info(f"Selected end date by role button: {to_day}")
-                end_date_selected = True
-        except Exception as e:
-            logging.warning(f"End date method 4 failed: {e}")
-    
-    if not end_date_selected:
-        logging.error(f"All end date selection methods failed for {to_day} {to_month} {to_year}")
-        raise Exception(f"Could not select end date {to_day} {to_month} {to_year} - date may not be available on calendar")
+        await navigate_calendar_to(page, to_month, to_year, "end")
+    await select_calendar_day(page, to_day, to_month, to_year, "end")
 
     await wait_like_human()
 
@@ -607,7 +1202,7 @@ async def apply_filters(page, mode) -> None:
     try:
         # Click More Filters button
         more_filters = page.get_by_role("button", name="More Filters")
-        await more_filters.wait_for(state="visible", timeout=20000)
+        await timed('click', more_filters.wait_for(state="visible", timeout=timeout_for('click')))
         await more_filters.click()
         await wait_like_human()
 
@@ -627,7 +1222,7 @@ async def apply_filters(page, mode) -> None:
 
         # Click Apply button
         apply_button = page.get_by_role("button", name="Apply")
-        await apply_button.wait_for(state="visible", timeout=15000)
+        await timed('click', apply_button.wait_for(state="visible", timeout=timeout_for('click')))
         await apply_button.click()
         await wait_like_human()
 
@@ -653,9 +1248,28 @@ async def apply_filters(page, mode) -> None:
         raise
 
 
-async def scrape_run(page, test_mode=False) -> list[dict]:
-    rows = []
-    page_num = 1
+async def scrape_run(page, test_mode=False, on_row=None, seen_index=None, early_stop_pages=0,
+                     progress=None, checkpoint_key=None, resume=None) -> list[dict]:
+    """Scrape every results page; `on_row` is called with each row as soon as it is parsed.
+
+    With a seen index and `early_stop_pages`, pagination stops once that many consecutive
+    pages held only listings seen before (this assumes newest-first ordering). Such a run
+    is marked incomplete in `progress` so the merge doesn't expire what it didn't reach.
+    A run that hits an error is marked incomplete too, with the error in `progress`.
+
+    With `checkpoint_key`, progress is checkpointed after every page; `resume` is a loaded
+    checkpoint whose rows are kept and whose next page the browser is already showing.
+    A resumed run is never complete: pages before the checkpoint aren't scraped again, and
+    listings posted since then push others onto those pages. The rows collected so far are
+    kept in progress['rows'] so they survive an error or a cancelled attempt.
+    """
+    rows = list(resume['rows']) if resume else []
+    page_num = resume['next_page'] if resume else 1
+    first_url = resume['first_url'] if resume else page.url
+    seen_pages = 0
+    if progress is None:
+        progress = {}
+    progress.update(complete=not resume, rows=rows)
 
     # First check if we have no results
     no_results = await page.locator("text=We're waiting on house and pet sitting opportunities").count() > 0
@@ -668,26 +1282,33 @@ async def scrape_run(page, test_mode=False) -> list[dict]:
             logging.info(f"Scraping page {page_num}")
 
             # Wait for search results to load
-            await page.wait_for_selector('div[data-testid="searchresults_grid_item"]', timeout=30000)
+            await timed('selector', page.wait_for_selector('div[data-testid="searchresults_grid_item"]',
+                                                           timeout=timeout_for('selector')))
             await safe_screenshot(page, f"debug/debug_results_page_{page_num}.png")
 
             # Get all listing cards
             cards = await page.locator('div[data-testid="searchresults_grid_item"]').all()
             logging.info(f"Found {len(cards)} cards on page {page_num}")
+            _profile_units['pages'] += 1
 
             if not cards: break
 
             # Process each card
+            page_start = len(rows)
             for card_idx, card in enumerate(cards if not test_mode else cards[:2]):
+                _profile_units['cards'] += 1
                 try:
-                    title = await card.locator('h3[data-testid="ListingCard__title"]').text_content(timeout=1000)
-                    loc = await card.locator('span[data-testid="ListingCard__location"]').text_content(timeout=1000)
+                    field_timeout = timeout_for('field')
+                    title = await timed('field', card.locator('h3[data-testid="ListingCard__title"]').text_content(
+                        timeout=field_timeout))
+                    loc = await timed('field', card.locator('span[data-testid="ListingCard__location"]').text_content(
+                        timeout=field_timeout))
                     town, country = split_location(loc)
 
                     # Get date range
                     date_elements = await card.locator("div[class*='UnOOR'] > span").all()
                     if date_elements:
-                        raw = await date_elements[0].text_content(timeout=1000)
+                        raw = await timed('field', date_elements[0].text_content(timeout=field_timeout))
                         d1, d2 = (re.split(r"\s*[-–]\s*", raw.replace('+', '').strip()) + ['', ''])[:2]
                     else:
                         d1, d2 = '', ''
@@ -696,13 +1317,13 @@ async def scrape_run(page, test_mode=False) -> list[dict]:
                     reviewing = await card.locator('span[data-testid="ListingCard__review__label"]').count() > 0
 
                     # Get the listing URL
-                    rel = await card.locator('a').get_attribute('href', timeout=1000)
+                    rel = await timed('field', card.locator('a').get_attribute('href', timeout=field_timeout))
 
                     # Extract pet information
                     pets = await extract_pets(card)
 
                     # Add the listing to our results
-                    rows.append({
+                    row = {
                         'url': f"https://www.trustedhousesitters.com{rel}",
                         'listing_id': listing_id_from_url(rel),
                         'date_range': f"{d1}→{d2}",
@@ -714,10 +1335,25 @@ async def scrape_run(page, test_mode=False) -> list[dict]:
                         'date_to': d2,
                         'reviewing': reviewing,
                         **pets
-                    })
+                    }
+                    row['content_hash'] = listing_fingerprint(row)
+                    rows.append(row)
+                    if on_row is not None:
+                        on_row(row)
                 except Exception as e:
                     logging.exception(f"Error parsing card {card_idx} on page {page_num}: {e}")
 
+            if early_stop_pages and seen_index is not None:
+                page_rows = rows[page_start:]
+                if page_rows and all(seen_index.has_key(r['listing_id'] + '|' + r['date_range']) for r in page_rows):
+                    seen_pages += 1
+                    if seen_pages >= early_stop_pages:
+                        logging.info(f"Stopping after page {page_num}: {seen_pages} pages of already seen listings")
+                        progress['complete'] = False
+                        break
+                else:
+                    seen_pages = 0
+
             # Check if there's a next page - first check if the next button exists
             try:
                 next_link = page.get_by_role('link', name='Go to next page')
@@ -729,7 +1365,7 @@ async def scrape_run(page, test_mode=False) -> list[dict]:
                     break
 
                 # If there is a next link, check if it's disabled
-                is_disabled = await next_link.get_attribute('aria-disabled', timeout=5000)
+                is_disabled = await timed('probe', next_link.get_attribute('aria-disabled', timeout=timeout_for('probe')))
 
                 if is_disabled == 'true':
                     logging.info("Next page link is disabled - this is the last page")
@@ -739,19 +1375,49 @@ async def scrape_run(page, test_mode=False) -> list[dict]:
                 await next_link.click()
                 await wait_like_human()
                 page_num += 1
+                if checkpoint_key:
+                    save_query_checkpoint(checkpoint_key, {'next_page': page_num, 'next_url': page.url,
+                                                           'first_url': first_url, 'rows': rows})
 
             except Exception as e:
-                # This could happen if we only have one page of results
+                # The missing next link on a single page of results is handled above, so this is a real failure
                 logging.info(f"No more pages or error navigating: {e}")
+                progress.update(complete=False, error=f"Navigation to page {page_num + 1} failed: {e}")
                 break
 
     except Exception as e:
         logging.error(f"Error in scrape_run: {e}")
+        progress.update(complete=False, error=str(e))
         await safe_screenshot(page, f"debug/error_scrape_run.png")
 
     return rows
 
 
+def listing_duration_days(date_from, date_to) -> int:
+    """Length of a sit in days, counting both the start and end day (0 if the dates can't be parsed)"""
+    try:
+        if not date_from or not date_to:
+            return 0
+        # Parse dates in format like "Dec 11, 2025" or "11 Dec 2025"
+        from_str = date_from.strip()
+        to_str = date_to.strip()
+
+        if not from_str or not to_str:
+            return 0
+
+        # Try different date formats
+        for fmt in ["%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%d %B %Y"]:
+            try:
+                from_date = datetime.strptime(from_str, fmt)
+                to_date = datetime.strptime(to_str, fmt)
+                return (to_date - from_date).days + 1  # Include both start and end days
+            except ValueError:
+                continue
+        return 0
+    except Exception:
+        return 0
+
+
 def apply_profile_filters(df, profile_config):
     """Apply profile-specific filters to the dataframe"""
     filtered_df = df.copy()
@@ -770,32 +1436,10 @@ def apply_profile_filters(df, profile_config):
     # Apply minimum days filter
     min_days = profile_config.get("filters", {}).get("min_days")
     if min_days is not None and min_days > 0:
-        def calculate_days(row):
-            try:
-                if not row['date_from'] or not row['date_to']:
-                    return 0
-                # Parse dates in format like "Dec 11, 2025" or "11 Dec 2025"
-                from_str = row['date_from'].strip()
-                to_str = row['date_to'].strip()
-                
-                if not from_str or not to_str:
-                    return 0
-                    
-                # Try different date formats
-                for fmt in ["%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%d %B %Y"]:
-                    try:
-                        from_date = datetime.strptime(from_str, fmt)
-                        to_date = datetime.strptime(to_str, fmt)
-                        return (to_date - from_date).days + 1  # Include both start and end days
-                    except ValueError:
-                        continue
-                return 0
-            except Exception:
-                return 0
-        
         # Calculate duration and filter
         filtered_df = filtered_df.copy()
-        filtered_df['duration_days'] = filtered_df.apply(calculate_days, axis=1)
+        filtered_df['duration_days'] = filtered_df.apply(
+            lambda row: listing_duration_days(row['date_from'], row['date_to']), axis=1)
         filtered_df = filtered_df[filtered_df['duration_days'] >= min_days]
         # Remove the temporary column
         filtered_df = filtered_df.drop('duration_days', axis=1)
@@ -803,181 +1447,1061 @@ def apply_profile_filters(df, profile_config):
     return filtered_df
 
 
-async def process_profile(profile_name, profile_config, test_mode=False):
-    logging.info(f"Processing profile: {profile_name}")
-    start_time = time.time()
+def row_passes_filters(row: dict, profile_config: dict) -> bool:
+    """Single-listing equivalent of apply_profile_filters"""
+    filters = profile_config.get("filters", {})
+    if row.get('country') in filters.get("excluded_countries", []):
+        return False
+    for pet_type, max_count in filters.get("max_pets", {}).items():
+        if pet_type in PET_TYPES and row.get(pet_type, 0) > max_count:
+            return False
+    min_days = filters.get("min_days")
+    if min_days is not None and min_days > 0:
+        if listing_duration_days(row.get('date_from'), row.get('date_to')) < min_days:
+            return False
+    return True
+
+
+# --- Streaming alerts ---
+# With --stream, scraped rows are pushed onto a queue as soon as each card is parsed
+# and a consumer alerts on unseen listings straight away instead of after the merge.
+# Transport flags are only known for the modes scraped so far, so they may be None.
+# Streamed keys are kept in STREAMED_PATH until a merge records the listing: a listing found
+# only by a filtered search (e.g. when the unfiltered one fails) never reaches the state,
+# and would otherwise be streamed again on every run.
+def load_streamed() -> dict:
+    """unique_key -> when it was streamed, for listings not yet recorded by a merge"""
+    try:
+        with open(STREAMED_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error(f"Unreadable streamed keys {STREAMED_PATH}, starting empty: {e}")
+        return {}
+
+
+def save_streamed(streamed: dict) -> None:
+    os.makedirs(os.path.dirname(STREAMED_PATH), exist_ok=True)
+    with open(STREAMED_PATH + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(streamed, f, indent=1, sort_keys=True)
+    os.replace(STREAMED_PATH + ".tmp", STREAMED_PATH)
+
+
+def prune_streamed(streamed: dict, state: dict, now: datetime) -> dict:
+    """Drop keys the state now records, and keys too old to still matter"""
+    cutoff = now - timedelta(days=STREAMED_MAX_AGE_DAYS)
+    return {key: at for key, at in streamed.items()
+            if key not in state and datetime.fromisoformat(at) >= cutoff}
+
+
+async def stream_alert(key, row, profile_name, mode, seen_index, profiles, streamed: dict) -> bool:
+    """Alert on one streamed row if it is new and passes the profile's filters"""
+    if key in streamed:
+        logging.info(f"Listing {key} was already streamed by an earlier run")
+        return False
+    if seen_index.has_key(key):
+        if seen_index.is_expired(key):
+            logging.info(f"Listing {key} has reappeared")
+        return False
+
+    profile_config = profiles[profile_name]
+    if not row_passes_filters(row, profile_config):
+        logging.info(f"Streamed listing {key} filtered out for profile {profile_name}")
+        return False
+    row = {**row, 'unique_key': key, 'profile': profile_name,
+           'public_transport': True if mode == 'public_transport' else None,
+           'car_included': True if mode == 'car_included' else None}
+    logging.info(f"Streaming alert for new listing {key} (profile {profile_name}, mode {mode})")
+    await asyncio.to_thread(deliver_notifications, profiles, [(profile_name, [row])])
+    streamed[key] = datetime.now(timezone.utc).isoformat()
+    save_streamed(streamed)
+    return True
+
+
+async def stream_alerts(queue: asyncio.Queue, seen_index, profiles: dict) -> set:
+    """Consume (profile, mode, row) items until a None sentinel; returns the unique_keys alerted"""
+    handled = set()  # Keys already dealt with this run
+    alerted = set()
+    streamed = load_streamed()
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        profile_name, mode, row = item
+        key = row['listing_id'] + '|' + row['date_range']
+        if key in handled:
+            continue
+        handled.add(key)
+        try:
+            if await stream_alert(key, row, profile_name, mode, seen_index, profiles, streamed):
+                alerted.add(key)
+        except Exception as e:
+            # Left to the end-of-run alerts, which go through reconcile as usual
+            logging.error(f"Streaming alert for {key} failed: {e}", exc_info=True)
+    logging.info(f"Streamed {len(alerted)} alerts")
+    return alerted
+
+
+# --- Event log ---
+# Listing history is stored as an append-only stream of events (new, changed,
+# expired, reappeared) in JSON-lines segments under EVENTS_DIR. Current state
+# is the fold of all events; EVENTS_CHECKPOINT_PATH caches that fold so a run
+# only has to replay the events appended since the last compaction.
+def _segment_path(number: int) -> str:
+    return os.path.join(EVENTS_DIR, f"events-{number:06d}.jsonl")
+
+
+def event_segments() -> list[str]:
+    """Paths of all event segments, oldest first"""
+    if not os.path.isdir(EVENTS_DIR):
+        return []
+    names = sorted(f for f in os.listdir(EVENTS_DIR) if re.fullmatch(r"events-\d{6}\.jsonl", f))
+    return [os.path.join(EVENTS_DIR, f) for f in names]
+
+
+def read_events(path: str, skip: int = 0):
+    """Yield events from a segment, skipping the first `skip` lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            if line_no < skip or not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.warning(f"Skipping corrupt event at {path}:{line_no + 1}: {e}")
+
+
+def append_events(events: list[dict]) -> bool:
+    """Append events to the active segment. Returns True if a new segment was started."""
+    if not events:
+        return False
+    os.makedirs(EVENTS_DIR, exist_ok=True)
+    segments = event_segments()
+    path = segments[-1] if segments else _segment_path(1)
+    rotated = False
+    if os.path.exists(path) and os.path.getsize(path) >= EVENT_SEGMENT_MAX_BYTES:
+        number = int(re.search(r"(\d{6})", os.path.basename(path)).group(1))
+        path = _segment_path(number + 1)
+        rotated = True
+        logging.info(f"Rotating event log to {path}")
+    with open(path, 'a', encoding='utf-8') as f:
+        for ev in events:
+            f.write(json.dumps(ev, separators=(',', ':'), ensure_ascii=False, default=str) + "\n")
+    logging.info(f"Appended {len(events)} events to {path}")
+    return rotated
+
+
+def apply_event(state: dict, ev: dict) -> None:
+    """Fold a single event into the listing state (keyed by unique_key)"""
+    key, kind, ts = ev['key'], ev['event'], ev['ts']
+    if kind == 'new':
+        rec = dict(ev['listing'])
+        rec.setdefault('first_seen', ts)
+        rec.setdefault('last_changed', ts)
+        rec.setdefault('expired', False)
+        state[key] = rec
+    elif kind == 'reappeared':
+        first_seen = state.get(key, {}).get('first_seen', ts)
+        state[key] = {**ev['listing'], 'first_seen': first_seen, 'last_changed': ts, 'expired': False}
+    elif kind == 'changed' and key in state:
+        rec = state[key]
+        for col, (_, new) in ev['changes'].items():
+            rec[col] = new
+        rec['profile'] = ev.get('profile', rec.get('profile'))
+        rec['last_changed'] = ts
+    elif kind == 'expired' and key in state:
+        state[key]['expired'] = True
+
+
+def diff_listing_state(state: dict, rows: list[dict], now: str, partial_profiles=()) -> list[dict]:
+    """Compare freshly scraped rows against the current state and return the events between them.
+
+    Listings belonging to `partial_profiles` are not expired when missing, and transport
+    flags that are None (unknown) keep their previous value.
+    """
+    events = []
+    seen = set()
+    for row in rows:
+        key = row['unique_key']
+        if key in seen:
+            continue  # Same listing found by more than one profile; the first profile wins
+        seen.add(key)
+        old = state.get(key)
+        if old is not None:
+            row = {**row, **{flag: old.get(flag) for flag in FLAG_COLS if row.get(flag) is None}}
+        if old is None:
+            events.append({'ts': now, 'event': 'new', 'key': key, 'profile': row.get('profile'), 'listing': row})
+        elif old.get('expired'):
+            events.append({'ts': now, 'event': 'reappeared', 'key': key, 'profile': row.get('profile'), 'listing': row})
+        else:
+            # One fingerprint comparison per listing; the field diff is only worked out when it differs
+            old_hash = old.get('content_hash') or listing_fingerprint(old)
+            new_hash = row.get('content_hash') or listing_fingerprint(row)
+            changes = {}
+            if old_hash != new_hash:
+                changes = {col: [old.get(col), row.get(col)] for col in CONTENT_COLS
+                           if normalize_content_value(col, old.get(col)) != normalize_content_value(col, row.get(col))}
+                changes['content_hash'] = [old.get('content_hash'), new_hash]
+            changes.update({flag: [old.get(flag), row.get(flag)] for flag in FLAG_COLS
+                            if bool(old.get(flag)) != bool(row.get(flag))})
+            if changes:
+                events.append({'ts': now, 'event': 'changed', 'key': key, 'profile': row.get('profile'),
+                               'changes': changes})
+
+    for key, old in state.items():
+        if key not in seen and not old.get('expired') and old.get('profile') not in partial_profiles:
+            events.append({'ts': now, 'event': 'expired', 'key': key, 'profile': old.get('profile')})
+    return events
+
+
+def _bootstrap_events_from_snapshot() -> None:
+    """Seed an empty event log from the legacy sits.json snapshot so no history is lost"""
+    if event_segments() or not os.path.exists(JSON_PATH) or os.path.getsize(JSON_PATH) == 0:
+        return
+    try:
+        with open(JSON_PATH, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except Exception as e:
+        logging.warning(f"Bad JSON, not bootstrapping event log: {e}")
+        return
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=HEADLESS)
-        ctx = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={'width': 1280, 'height': 800},
-            locale='en-US'
-        )
-        await ctx.add_init_script("Object.defineProperty(navigator,'webdriver',{get:()=>undefined})")
-
-        async def run_mode(mode):
-            page = await ctx.new_page()
+    default_fs = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat() + 'Z'
+    events = []
+    for rec in records:
+        rec = {k: v for k, v in rec.items() if k != 'new_this_run'}
+        key = rec.get('unique_key') or listing_id_from_url(rec['url']) + '|' + f"{rec['date_from']}→{rec['date_to']}"
+        rec['unique_key'] = key
+        rec['public_transport'] = bool(rec.get('public_transport') or False)
+        rec['car_included'] = bool(rec.get('car_included') or False)
+        rec['expired'] = bool(rec.get('expired') or False)
+        rec.setdefault('first_seen', default_fs)
+        rec.setdefault('last_changed', rec['first_seen'])
+        events.append({'ts': rec['first_seen'], 'event': 'new', 'key': key, 'profile': rec.get('profile'),
+                       'listing': rec})
+    logging.info(f"Bootstrapping event log with {len(events)} listings from {JSON_PATH}")
+    append_events(events)
+
+
+def load_state(rebuild=False) -> dict:
+    """Current listing state: the compacted checkpoint plus any events appended after it"""
+    _bootstrap_events_from_snapshot()
+    state, applied = {}, {}
+    if not rebuild and os.path.exists(EVENTS_CHECKPOINT_PATH):
+        try:
+            with open(EVENTS_CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            state, applied = checkpoint['listings'], checkpoint['segments']
+        except Exception as e:
+            logging.warning(f"Bad event checkpoint, replaying full log: {e}")
+            state, applied = {}, {}
+
+    for path in event_segments():
+        for ev in read_events(path, skip=applied.get(os.path.basename(path), 0)):
+            apply_event(state, ev)
+    return state
+
+
+def export_snapshots(state: dict) -> None:
+    """Write the current state out as the sits.csv / sits.json snapshots"""
+    import pandas as pd
+    df = pd.DataFrame(list(state.values()))
+    df.to_csv(CSV_PATH, index=False, quoting=csv.QUOTE_NONNUMERIC)
+    df.to_json(JSON_PATH, orient='records', indent=2)
+
+
+def compact_events(state: dict | None = None, rebuild=False) -> dict:
+    """Checkpoint the folded event log and refresh the snapshot exports"""
+    if state is None:
+        state = load_state(rebuild=rebuild)
+    segments = {}
+    for path in event_segments():
+        with open(path, 'r', encoding='utf-8') as f:
+            segments[os.path.basename(path)] = sum(1 for _ in f)
+    os.makedirs(EVENTS_DIR, exist_ok=True)
+    tmp_path = EVENTS_CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'segments': segments, 'listings': state}, f, separators=(',', ':'), ensure_ascii=False,
+                  default=str)
+    os.replace(tmp_path, EVENTS_CHECKPOINT_PATH)
+    export_snapshots(state)
+    logging.info(f"Compacted {sum(segments.values())} events into {len(state)} listings")
+    return state
+
+
+def listing_history(query: str) -> list[dict]:
+    """All events for a unique_key or listing_id, oldest first"""
+    return [ev for path in event_segments() for ev in read_events(path)
+            if ev['key'] == query or ev['key'].split('|', 1)[0] == query]
+
+
+# --- Seen index ---
+# A compact, persisted index of every listing already in the state: sorted arrays of
+# 64-bit hashes of the unique_keys and of the expired unique_keys. It loads in
+# milliseconds and answers "already seen?" per card without holding history in memory.
+# A hash collision could only make a new listing look seen; the end-of-run merge works
+# on the exact state, so such a listing is still alerted there.
+def _key_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _sorted_contains(arr, h: int) -> bool:
+    i = bisect.bisect_left(arr, h)
+    return i < len(arr) and arr[i] == h
+
+
+def event_log_position() -> str:
+    """Marker of how far the event log has been written, used to detect a stale seen index"""
+    segments = event_segments()
+    if not segments:
+        return ""
+    return f"{os.path.basename(segments[-1])}:{os.path.getsize(segments[-1])}"
+
+
+class SeenIndex:
+    def __init__(self, keys=(), expired=(), position=""):
+        self.keys = array.array('Q', sorted(set(keys)))
+        self.expired = array.array('Q', sorted(set(expired)))
+        self.position = position
+
+    @classmethod
+    def from_state(cls, state: dict, position: str) -> "SeenIndex":
+        return cls(keys=(_key_hash(k) for k in state),
+                   expired=(_key_hash(k) for k, rec in state.items() if rec.get('expired')),
+                   position=position)
+
+    def has_key(self, unique_key: str) -> bool:
+        return _sorted_contains(self.keys, _key_hash(unique_key))
+
+    def is_expired(self, unique_key: str) -> bool:
+        return _sorted_contains(self.expired, _key_hash(unique_key))
+
+    def save(self, path=SEEN_INDEX_PATH) -> None:
+        header = {'position': self.position, 'byteorder': sys.byteorder,
+                  'counts': {'keys': len(self.keys), 'expired': len(self.expired)}}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b"\n")
+            for arr in (self.keys, self.expired):
+                f.write(arr.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=SEEN_INDEX_PATH) -> "SeenIndex | None":
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                index = cls(position=header['position'])
+                for name in ('keys', 'expired'):
+                    count = header['counts'][name]
+                    arr = array.array('Q')
+                    arr.frombytes(f.read(count * arr.itemsize))
+                    if header['byteorder'] != sys.byteorder:
+                        arr.byteswap()
+                    setattr(index, name, arr)
+            return index
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Bad seen index {path}, rebuilding: {e}")
+            return None
+
+
+async def get_seen_index(state_task) -> SeenIndex:
+    """Load the persisted seen index, rebuilding it from the state if it is missing or behind the event log"""
+    start = time.perf_counter()
+    index = SeenIndex.load()
+    if index is not None and index.position == event_log_position():
+        logging.info(f"Loaded seen index with {len(index.keys)} listings in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return index
+    state = await state_task
+    index = SeenIndex.from_state(state, event_log_position())
+    logging.info(f"Rebuilt seen index with {len(index.keys)} listings from the state")
+    return index
+
+
+def write_seen_index(state: dict) -> None:
+    SeenIndex.from_state(state, event_log_position()).save()
+
+
+# --- Query checkpoints ---
+# Each query checkpoints the rows collected so far and the page it reached, so a retry
+# (or the next run) resumes where a failure left off instead of starting over.
+def query_checkpoint_key(profile_name, profile_config, mode) -> str:
+    search = profile_config["search"]
+    return f"{profile_name}|{mode}|{search['location']}|{search['date_from']}|{search['date_to']}"
+
+
+def _query_checkpoint_path(key: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + ".json")
+
+
+def load_query_checkpoint(key: str) -> dict | None:
+    path = _query_checkpoint_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if checkpoint.get('key') != key or time.time() - checkpoint.get('saved_at', 0) > CHECKPOINT_MAX_AGE_HOURS * 3600:
+        clear_query_checkpoint(key)
+        return None
+    return checkpoint
+
+
+def save_query_checkpoint(key: str, checkpoint: dict) -> None:
+    try:
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        path = _query_checkpoint_path(key)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({**checkpoint, 'key': key, 'saved_at': time.time()}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except Exception as e:
+        logging.warning(f"Failed to save checkpoint for {key}: {e}")
+
+
+def clear_query_checkpoint(key: str) -> None:
+    try:
+        os.remove(_query_checkpoint_path(key))
+    except FileNotFoundError:
+        pass
+
+
+async def resume_query(page, profile_config, mode, checkpoint: dict) -> None:
+    """Bring the page to the results page a checkpoint stopped at"""
+    # When pagination shows up in the URL, jump straight to the page
+    if checkpoint['next_url'] != checkpoint['first_url']:
+        try:
+            await timed('goto', page.goto(checkpoint['next_url'], wait_until='domcontentloaded',
+                                          timeout=timeout_for('goto')))
+            await timed('selector', page.wait_for_selector('div[data-testid="searchresults_grid_item"]',
+                                                           timeout=timeout_for('selector')))
+            return
+        except Exception as e:
+            logging.warning(f"Could not open checkpointed page directly, replaying the search: {e}")
+
+    # Otherwise redo the search and page forward without extracting any cards
+    await initial_search(page, profile_config)
+    await apply_filters(page, mode)
+    for _ in range(1, checkpoint['next_page']):
+        await timed('click', page.get_by_role('link', name='Go to next page').click(timeout=timeout_for('click')))
+        await wait_like_human()
+
+
+async def run_query(ctx, profile_name, profile_config, mode, test_mode=False, on_row=None, seen_index=None):
+    """Run one search (a profile in one filter mode); returns its rows and whether it ran to completion.
+
+    Failures and stalls are retried up to QUERY_RETRIES times on a fresh page, resuming from the
+    query checkpoint. If every attempt fails, or the run's time budget runs out, the rows
+    collected so far are returned as an incomplete result.
+    """
+    key = query_checkpoint_key(profile_name, profile_config, mode)
+    checkpoint = load_query_checkpoint(key)
+    emit = (lambda row: on_row(profile_name, mode, row)) if on_row else None
+
+    async def attempt_query(page, checkpoint, progress):
+        if checkpoint:
+            logging.info(f"Resuming {profile_name}, mode {mode} at page {checkpoint['next_page']} "
+                         f"with {len(checkpoint['rows'])} rows from checkpoint")
+            await resume_query(page, profile_config, mode, checkpoint)
+            if emit:
+                for row in checkpoint['rows']:
+                    emit(row)
+        else:
+            await initial_search(page, profile_config)
+            no_results = await page.locator("text=We're waiting on house and pet sitting opportunities").count() > 0
+            if no_results:
+                logging.info(f"No results available for profile {profile_name}, mode {mode}")
+                progress['complete'] = True
+                return []
+            await apply_filters(page, mode)
+
+        return await scrape_run(page, test_mode, on_row=emit, seen_index=seen_index,
+                                early_stop_pages=profile_config["search"].get("early_stop_pages", 0),
+                                progress=progress, checkpoint_key=key, resume=checkpoint)
+
+    best_rows = []  # Most rows any attempt got, kept if every attempt fails
+    for attempt in range(QUERY_RETRIES + 1):
+        if run_time_left() <= 0:
+            logging.warning(f"Run budget exhausted, not running {profile_name}, mode {mode}")
+            break
+        page = await ctx.new_page()
+        progress = {}
+        try:
+            # The watchdog recycles the page if it stalls or the run's time budget runs out
+            results = await run_with_watchdog(attempt_query(page, checkpoint, progress), run_time_left())
+            logging.info(f"Found {len(results)} results for {profile_name}, mode {mode}")
+            if 'error' not in progress:
+                clear_query_checkpoint(key)
+                return results, progress['complete']
+            logging.warning(f"Mode {mode} for profile {profile_name} stopped early: {progress['error']}")
+        except Exception as e:
+            logging.critical(f"Mode {mode} failed for profile {profile_name}: {e}", exc_info=True)
             try:
-                await initial_search(page, profile_config)
-                no_results = await page.locator("text=We're waiting on house and pet sitting opportunities").count() > 0
-                if no_results:
-                    logging.info(f"No results available for profile {profile_name}, mode {mode}")
-                    return mode, []
-                await apply_filters(page, mode)
-                results = await scrape_run(page, test_mode)
-                logging.info(f"Found {len(results)} results for {profile_name}, mode {mode}")
-                return mode, results
-            except Exception as e:
-                logging.critical(f"Mode {mode} failed for profile {profile_name}: {e}", exc_info=True)
                 html = await page.content()
                 with open(f"debug/crash_dump_{profile_name}_{mode}.html", "w") as f:
                     f.write(html)
-                await safe_screenshot(page, f"debug/crash_screenshot_{profile_name}_{mode}.png", full_page=True)
-                return mode, []
-
-        # Run all filter modes sequentially to get transport information
-        results = []
-        for mode in MODES:
-            logging.info(f"Running mode: {mode} for profile {profile_name}")
-            result = await run_mode(mode)
-            results.append(result)
-        
-        await browser.close()
+            except Exception as dump_error:
+                logging.warning(f"Failed to save crash dump: {dump_error}")
+            await safe_screenshot(page, f"debug/crash_screenshot_{profile_name}_{mode}.png", full_page=True)
+        finally:
+            await page.close()
+
+        if len(progress.get('rows', ())) > len(best_rows):
+            best_rows = progress['rows']
+        checkpoint = load_query_checkpoint(key)
+        if attempt < QUERY_RETRIES:
+            logging.info(f"Retrying {profile_name}, mode {mode} (attempt {attempt + 2}/{QUERY_RETRIES + 1})")
+
+    rows = checkpoint['rows'] if checkpoint and len(checkpoint['rows']) > len(best_rows) else best_rows
+    logging.warning(f"Giving up on {profile_name}, mode {mode}; keeping {len(rows)} partial rows")
+    return rows, False
+
+
+# --- Query planner ---
+# A profile can set "split" in its search config ("month", or a number of days) to break a
+# long date window into sub-windows that are searched concurrently, each on its own page,
+# instead of paging through one long result list. The site only returns sits that lie
+# entirely inside the chosen dates, so each sub-window's search runs SPLIT_OVERLAP_DAYS past
+# its end (never past the profile's date_to) to catch sits that start in it but end later.
+# Sits then show up in more than one search; rows are deduplicated on unique_key. A sit
+# longer than SPLIT_OVERLAP_DAYS that crosses a sub-window boundary is still missed.
+def plan_search_windows(search: dict) -> list[tuple[str, str]]:
+    """The (date_from, date_to) searches to run for a profile, in order"""
+    split = search.get("split")
+    if not split:
+        return [(search["date_from"], search["date_to"])]
+    start = datetime.strptime(search["date_from"], "%d %b %Y")
+    end = datetime.strptime(search["date_to"], "%d %b %Y")
+
+    windows = []
+    while start <= end:
+        if split == "month":
+            last_day = calendar.monthrange(start.year, start.month)[1]
+            window_end = min(start.replace(day=last_day), end)
+        else:
+            window_end = min(start + timedelta(days=int(split) - 1), end)
+        windows.append((start, min(window_end + timedelta(days=SPLIT_OVERLAP_DAYS), end)))
+        start = window_end + timedelta(days=1)
+    # Match the unpadded day the date picker labels use, e.g. "1 Jan 2026"
+    return [tuple(f"{d.day} {d.strftime('%b %Y')}" for d in window) for window in windows]
+
+
+def dedupe_rows(rows) -> list[dict]:
+    """Drop repeated listings (same listing and dates), keeping the first occurrence"""
+    seen = set()
+    unique = []
+    for row in rows:
+        key = row['listing_id'] + '|' + row['date_range']
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
+async def run_planned_query(ctx, profile_name, profile_config, mode, test_mode=False, on_row=None, seen_index=None):
+    """run_query, fanned out over the profile's sub-windows when it asks for a split"""
+    windows = plan_search_windows(profile_config["search"])
+    if len(windows) == 1:
+        return await run_query(ctx, profile_name, profile_config, mode, test_mode, on_row, seen_index)
+
+    logging.info(f"Splitting {profile_name}, mode {mode} into {len(windows)} windows: {windows}")
+    semaphore = asyncio.Semaphore(SPLIT_CONCURRENCY)
+
+    async def run_window(date_from, date_to):
+        window_config = {**profile_config, "search": {**profile_config["search"],
+                                                      "date_from": date_from, "date_to": date_to}}
+        async with semaphore:
+            return await run_query(ctx, profile_name, window_config, mode, test_mode, on_row, seen_index)
+
+    results = await asyncio.gather(*(run_window(*window) for window in windows))
+    rows = dedupe_rows(row for window_rows, _ in results for row in window_rows)
+    logging.info(f"Split query {profile_name}, mode {mode}: {sum(len(r) for r, _ in results)} rows, "
+                 f"{len(rows)} after deduplication")
+    return rows, all(complete for _, complete in results)
+
+
+async def process_profile(profile_name, profile_config, ctx, test_mode=False, on_row=None, seen_index=None):
+    """Scrape every mode for a profile; returns the rows per mode and the set of modes that are incomplete"""
+    logging.info(f"Processing profile: {profile_name}")
+    start_time = time.time()
+    runs, incomplete = {}, set()
+
+    # Run all filter modes sequentially to get transport information
+    for mode in MODES:
+        logging.info(f"Running mode: {mode} for profile {profile_name}")
+        rows, complete = await run_planned_query(ctx, profile_name, profile_config, mode, test_mode, on_row,
+                                                 seen_index)
+        runs[mode] = rows
+        if not complete:
+            incomplete.add(mode)
+
+    logging.info(f"Profile {profile_name} scraped in {time.time() - start_time:.2f}s")
+    return runs, incomplete
 
-    runs = dict(results)
 
+def combine_profile_runs(profile_name, runs: dict, incomplete=()):
+    """Join the per-mode scrape results of a profile into one listing frame with transport flags.
+
+    A flag from an incomplete filter mode is only trusted when it is True; listings that mode
+    didn't reach get None so the merge keeps their previous value.
+    """
+    import pandas as pd
     base_df = pd.DataFrame(runs.get(None, []))
     if base_df.empty:
         logging.warning(f"No results found for profile {profile_name}")
         return pd.DataFrame()
 
-    now = datetime.now(timezone.utc).isoformat() + 'Z'
-    public_transport_ids = [listing_id_from_url(r['url']) for r in runs.get('public_transport', [])]
-    car_included_ids = [listing_id_from_url(r['url']) for r in runs.get('car_included', [])]
+    public_transport_ids = {listing_id_from_url(r['url']) for r in runs.get('public_transport', [])}
+    car_included_ids = {listing_id_from_url(r['url']) for r in runs.get('car_included', [])}
 
-    for idx, row in base_df.iterrows():
-        listing_id = row['listing_id']
+    for listing_id in base_df['listing_id']:
         pt_match = listing_id in public_transport_ids
         car_match = listing_id in car_included_ids
         logging.info(f"Listing {listing_id} - Public transport: {pt_match}, Car included: {car_match}")
 
-    base_df['public_transport'] = base_df['listing_id'].isin(public_transport_ids).astype(bool)
-    base_df['car_included'] = base_df['listing_id'].isin(car_included_ids).astype(bool)
+    for flag, ids in (('public_transport', public_transport_ids), ('car_included', car_included_ids)):
+        if flag in incomplete:
+            base_df[flag] = [True if listing_id in ids else None for listing_id in base_df['listing_id']]
+        else:
+            base_df[flag] = base_df['listing_id'].isin(ids).astype(bool)
     base_df['unique_key'] = base_df['listing_id'] + '|' + base_df['date_range']
     base_df['profile'] = profile_name
 
-    logging.info(f"Profile {profile_name} completed in {time.time() - start_time:.2f}s, found {len(base_df)} listings")
+    logging.info(f"Profile {profile_name} found {len(base_df)} listings")
     return base_df
 
+
+# --- Post-processing ---
+# Merging, filtering, formatting and serialization are CPU-bound and run behind an
+# executor so the event loop stays free for in-flight pages. Everything submitted
+# here must be a picklable module-level function for the process pool option.
+_postprocess_executor = None
+
+
+def get_postprocess_executor():
+    global _postprocess_executor
+    if _postprocess_executor is None:
+        if POSTPROCESS_EXECUTOR == 'process':
+            _postprocess_executor = concurrent.futures.ProcessPoolExecutor(max_workers=POSTPROCESS_WORKERS)
+        else:
+            _postprocess_executor = concurrent.futures.ThreadPoolExecutor(max_workers=POSTPROCESS_WORKERS,
+                                                                          thread_name_prefix="postprocess")
+    return _postprocess_executor
+
+
+async def run_postprocess(fn, *args):
+    """Run a post-processing step on the configured executor (or inline)"""
+    if POSTPROCESS_EXECUTOR == 'inline':
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_postprocess_executor(), functools.partial(fn, *args))
+
+
+def shutdown_postprocess_executor() -> None:
+    global _postprocess_executor
+    if _postprocess_executor is not None:
+        _postprocess_executor.shutdown(wait=True)
+        _postprocess_executor = None
+
+
+def merge_run(state: dict, frames: list, now: str, partial_profiles=()) -> tuple[dict, list[dict]]:
+    """Diff the scraped frames against the state; returns the updated state and the events"""
+    import pandas as pd
+    rows = pd.concat(frames, ignore_index=True).to_dict('records')
+    events = diff_listing_state(state, rows, now, partial_profiles)
+    for ev in events:
+        apply_event(state, ev)
+    return state, events
+
+
+def build_alerts(profiles: dict, new_rows: list[dict]) -> list[tuple[str, list[dict]]]:
+    """Filter the new listings per profile into (profile, rows) pairs"""
+    if not new_rows:
+        return []
+    import pandas as pd
+    out_df = pd.DataFrame(new_rows)
+    alerts = []
+    for profile_name, profile_config in profiles.items():
+        profile_df = apply_profile_filters(out_df[out_df['profile'] == profile_name], profile_config)
+        if not profile_df.empty:
+            alerts.append((profile_name, profile_df.to_dict('records')))
+    return alerts
+
+
 # --- Modify main to run profiles in parallel (unchanged if already done) ---
-async def main(test_mode=False) -> None:
+async def main(test_mode=False, stream=False) -> None:
     logging.info("Starting scrape")
+    start_run_clock()
     start_time = time.time()
 
     profiles = load_profiles()
     logging.info(f"Loaded {len(profiles)} search profiles")
     
-    # Process profiles sequentially
+    # Load the current state off the event loop while the browser starts scraping
+    had_checkpoint = os.path.exists(EVENTS_CHECKPOINT_PATH)
+    state_task = asyncio.create_task(run_postprocess(load_state))
+
+    index_task = asyncio.create_task(get_seen_index(state_task))
+
+    # Process profiles sequentially, sharing one browser session across all of them.
+    # Each profile's results are combined in the background while the next one scrapes.
     results = []
-    for profile_name, profile_config in profiles.items():
+    partial_profiles = set()
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser, ctx = await open_session(p)
+        seen_index = await index_task
+
+        on_row, stream_task = None, None
+        if stream:
+            queue = asyncio.Queue()
+            stream_task = asyncio.create_task(stream_alerts(queue, seen_index, profiles))
+            on_row = lambda *item: queue.put_nowait(item)
+
         try:
-            logging.info(f"Processing profile: {profile_name}")
-            result = await process_profile(profile_name, profile_config, test_mode)
-            results.append((profile_name, result))
+            for profile_name, profile_config in profiles.items():
+                try:
+                    logging.info(f"Processing profile: {profile_name}")
+                    runs, incomplete = await process_profile(profile_name, profile_config, ctx, test_mode,
+                                                             on_row=on_row, seen_index=seen_index)
+                    if None in incomplete:
+                        partial_profiles.add(profile_name)
+                    results.append((profile_name, asyncio.create_task(
+                        run_postprocess(combine_profile_runs, profile_name, runs, incomplete))))
+                except Exception as e:
+                    logging.error(f"Failed to process profile {profile_name}: {e}", exc_info=True)
+        finally:
+            await close_session(browser, ctx)
+            if stream_task is not None:
+                queue.put_nowait(None)
+
+    # Persistence is reconciled below as usual; listings already streamed are not alerted twice
+    streamed = set()
+    if stream_task is not None:
+        try:
+            streamed = await stream_task
         except Exception as e:
-            logging.error(f"Failed to process profile {profile_name}: {e}", exc_info=True)
-            results.append((profile_name, e))
+            logging.error(f"Streaming alerts failed, alerting at the end of the run instead: {e}", exc_info=True)
+    stats = await reconcile_results(profiles, results, partial_profiles, state_task, had_checkpoint, streamed)
+
+    shutdown_postprocess_executor()
+    save_run_stats('run', start_time, stats)
+    logging.info(f"Done in {time.time() - start_time:.2f}s")
 
+
+async def reconcile_results(profiles, results, partial_profiles, state_task, had_checkpoint,
+                            streamed=frozenset()) -> dict:
+    """Merge the combined per-profile frames into the event log and send the alerts; returns run stats"""
     all_results = []
-    for name, result in results:
-        if isinstance(result, pd.DataFrame) and not result.empty:
+    for name, task in results:
+        try:
+            result = await task
+        except Exception as e:
+            logging.error(f"Profile {name} raised exception: {e}", exc_info=True)
+            continue
+        if not result.empty:
             all_results.append(result)
-        elif isinstance(result, Exception):
-            logging.error(f"Profile {name} raised exception: {result}", exc_info=True)
 
+    state = await state_task
     if not all_results:
         logging.warning("No results found for any profile")
-        return
+        # Digests and throttled alerts held back by earlier runs may still be due
+        await asyncio.to_thread(deliver_notifications, profiles, [])
+        save_streamed(prune_streamed(load_streamed(), state, datetime.now(timezone.utc)))
+        return {'listings': len(state), 'events': {}, 'alerts': {}, 'partial_profiles': sorted(partial_profiles)}
 
-    base_df = pd.concat(all_results, ignore_index=True)
+    now = datetime.now(timezone.utc).isoformat() + 'Z'
+    state, events = await run_postprocess(merge_run, state, all_results, now, partial_profiles)
+    rotated = await run_postprocess(append_events, events)
+    index_write = asyncio.create_task(run_postprocess(write_seen_index, state))
+
+    counts = {}
+    for ev in events:
+        counts[ev['event']] = counts.get(ev['event'], 0) + 1
+    logging.info(f"Listing events this run: {counts or 'none'}")
+
+    # Only the delta is appended to the event log and the fold is checkpointed when a segment
+    # is sealed, but the sits.csv / sits.json snapshots CI commits are refreshed every run
+    if rotated or not had_checkpoint:
+        compaction = asyncio.create_task(run_postprocess(compact_events, state))
+    else:
+        compaction = asyncio.create_task(run_postprocess(export_snapshots, state))
 
-    if os.path.exists(JSON_PATH) and os.path.getsize(JSON_PATH) > 0:
-        try:
-            old_df = pd.read_json(JSON_PATH)
-        except Exception as e:
-            logging.warning(f"Bad JSON, reset: {e}")
-            old_df = pd.DataFrame()
+    new_rows = [state[ev['key']] for ev in events if ev['event'] == 'new']
+    if new_rows:
+        logging.info(f"Found {len(new_rows)} new listings this run")
     else:
-        old_df = pd.DataFrame()
+        logging.info("No new listings found this run")
+    # Skip listings streamed this run or by an earlier run whose merge didn't record them
+    earlier = load_streamed()
+    new_rows = [r for r in new_rows if r['unique_key'] not in streamed and r['unique_key'] not in earlier]
+    save_streamed(prune_streamed(earlier, state, datetime.now(timezone.utc)))
+
+    alerts = await run_postprocess(build_alerts, profiles, new_rows)
+    alerted = {name for name, _ in alerts}
+    for profile_name in profiles:
+        if profile_name not in alerted and new_rows:
+            logging.info(f"No new listings to alert for profile {profile_name}")
+    for profile_name, rows in alerts:
+        logging.info(f"Queueing {len(rows)} alerts for profile {profile_name}")
+    await asyncio.to_thread(deliver_notifications, profiles, alerts)
 
-    old_df['public_transport'] = old_df.get('public_transport', False).fillna(False).astype(bool)
-    old_df['car_included'] = old_df.get('car_included', False).fillna(False).astype(bool)
-    default_fs = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat() + 'Z'
-    old_df['first_seen'] = old_df.get('first_seen', default_fs)
-    old_df['last_changed'] = old_df.get('last_changed', old_df['first_seen'])
+    await index_write
+    await compaction
+    return {'listings': len(state), 'events': counts, 'alerts': {name: len(rows) for name, rows in alerts},
+            'streamed': len(streamed), 'partial_profiles': sorted(partial_profiles)}
 
-    if 'unique_key' not in old_df:
-        old_df['unique_key'] = old_df.apply(
-            lambda r: listing_id_from_url(r['url']) + '|' + f"{r['date_from']}→{r['date_to']}", axis=1
-        )
 
-    merged = old_df.set_index('unique_key').combine_first(base_df.set_index('unique_key'))
+# --- Sharded execution ---
+# A run can be split across runners: each shard scrapes a deterministic slice of the
+# query plan and writes its raw rows to SHARDS_DIR; --merge-shards then combines the
+# partials into the state and sends the alerts. Queries no shard reported are treated
+# as incomplete, so a missing shard never expires listings or clears transport flags.
+def build_query_plan(profiles: dict) -> list[tuple[str, str | None]]:
+    """Every (profile, mode) search a full run performs, in a fixed order"""
+    return [(profile_name, mode) for profile_name in profiles for mode in MODES]
 
-    now = datetime.now(timezone.utc).isoformat() + 'Z'
-    for uk, row in merged.iterrows():
-        if uk in base_df['unique_key'].values:
-            nr = base_df.loc[base_df['unique_key'] == uk].iloc[0]
-            orow = old_df.loc[old_df['unique_key'] == uk].iloc[0] if uk in old_df['unique_key'].values else None
-            changed = orow is None or any(
-                nr[col] != orow[col] for col in CONTENT_COLS + ['public_transport', 'car_included']
-            )
-            merged.at[uk, 'last_changed'] = now if changed else row['last_changed']
-            merged.at[uk, 'profile'] = nr['profile']
-
-    merged['first_seen'] = merged['first_seen'].fillna(now)
-    df = merged.reset_index()
-    df['new_this_run'] = df['first_seen'] == now
-
-    old_keys = set(old_df['unique_key'])
-    new_keys = set(df['unique_key'])
-    exp_keys = old_keys - new_keys
-    exp_df = old_df[old_df['unique_key'].isin(exp_keys)].copy()
-    exp_df['expired'] = True
-    exp_df['new_this_run'] = False
-    df['expired'] = False
-
-    out_df = pd.concat([df, exp_df], ignore_index=True)
-
-    out_df.to_csv(CSV_PATH, index=False, quoting=csv.QUOTE_NONNUMERIC)
-    out_df.to_json(JSON_PATH, orient='records', indent=2)
-    
-    # Count new listings this run
-    new_listings_count = len(out_df[out_df['new_this_run'] == True])
-    if new_listings_count > 0:
-        logging.info(f"Found {new_listings_count} new listings this run")
-    else:
-        logging.info("No new listings found this run")
 
-    for profile_name, profile_config in profiles.items():
-        profile_df = out_df[(out_df['new_this_run']) & (out_df['profile'] == profile_name)]
-        profile_df = apply_profile_filters(profile_df, profile_config)
+def shard_queries(plan: list, shard_index: int, shard_count: int) -> list:
+    return [query for i, query in enumerate(plan) if i % shard_count == shard_index]
 
-        if profile_df.empty:
-            logging.info(f"No new listings to alert for profile {profile_name}")
-        else:
-            logging.info(f"Sending {len(profile_df)} alerts for profile {profile_name}")
-            send_telegram_message(format_telegram_message(profile_df.to_dict('records'), profile_config))
 
-    logging.info(f"Done in {time.time() - start_time:.2f}s")
+def _shard_path(shard_index: int, shard_count: int) -> str:
+    return os.path.join(SHARDS_DIR, f"shard-{shard_index}-of-{shard_count}.json")
+
+
+async def run_shard(shard_index: int, shard_count: int, test_mode=False) -> None:
+    logging.info(f"Starting shard {shard_index + 1}/{shard_count}")
+    start_run_clock()
+    start_time = time.time()
+    profiles = load_profiles()
+    queries = shard_queries(build_query_plan(profiles), shard_index, shard_count)
+    logging.info(f"Shard {shard_index} runs {len(queries)} queries: {queries}")
+
+    state_task = asyncio.create_task(run_postprocess(load_state))
+    index_task = asyncio.create_task(get_seen_index(state_task))
+    partials = []
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser, ctx = await open_session(p)
+        seen_index = await index_task
+        try:
+            for profile_name, mode in queries:
+                rows, complete = await run_planned_query(ctx, profile_name, profiles[profile_name], mode, test_mode,
+                                                         seen_index=seen_index)
+                partials.append({'profile': profile_name, 'mode': mode, 'complete': complete, 'rows': rows})
+        finally:
+            await close_session(browser, ctx)
+
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    path = _shard_path(shard_index, shard_count)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'shard': shard_index, 'shard_count': shard_count,
+                   'created': datetime.now(timezone.utc).isoformat() + 'Z', 'queries': partials},
+                  f, ensure_ascii=False)
+    await state_task
+    shutdown_postprocess_executor()
+    logging.info(f"Shard {shard_index} wrote {sum(len(q['rows']) for q in partials)} rows to {path} "
+                 f"in {time.time() - start_time:.2f}s")
+
+
+async def merge_shards() -> None:
+    logging.info("Merging shard results")
+    start_time = time.time()
+    profiles = load_profiles()
+    had_checkpoint = os.path.exists(EVENTS_CHECKPOINT_PATH)
+    state_task = asyncio.create_task(run_postprocess(load_state))
+
+    paths = sorted(glob.glob(os.path.join(SHARDS_DIR, "shard-*-of-*.json")))
+    shards = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                shards.append(json.load(f))
+        except Exception as e:
+            logging.error(f"Skipping unreadable shard file {path}: {e}")
+    if not shards:
+        logging.warning(f"No shard results found in {SHARDS_DIR}")
+        await state_task
+        return
+
+    shard_count = max(s['shard_count'] for s in shards)
+    shards = [s for s in shards if s['shard_count'] == shard_count]
+    missing = set(range(shard_count)) - {s['shard'] for s in shards}
+    if missing:
+        logging.warning(f"Missing results for shards {sorted(missing)} of {shard_count}; their queries count as incomplete")
+
+    runs = {name: {} for name in profiles}
+    incomplete = {name: set() for name in profiles}
+    for shard in shards:
+        for query in shard['queries']:
+            if query['profile'] not in profiles:
+                logging.warning(f"Shard {shard['shard']} has results for unknown profile {query['profile']!r}, "
+                                f"ignoring them")
+                continue
+            runs[query['profile']][query['mode']] = query['rows']
+            if not query['complete']:
+                incomplete[query['profile']].add(query['mode'])
+    for profile_name, mode in build_query_plan(profiles):
+        if mode not in runs[profile_name]:
+            incomplete[profile_name].add(mode)
+
+    results = [(name, asyncio.create_task(run_postprocess(combine_profile_runs, name, runs[name], incomplete[name])))
+               for name in profiles]
+    partial_profiles = {name for name in profiles if None in incomplete[name]}
+    stats = await reconcile_results(profiles, results, partial_profiles, state_task, had_checkpoint)
+
+    for path in paths:
+        os.remove(path)
+    shutdown_postprocess_executor()
+    save_run_stats('merge-shards', start_time, {**stats, 'shards': len(shards), 'missing_shards': sorted(missing)})
+    logging.info(f"Merged {len(shards)} shards in {time.time() - start_time:.2f}s")
+
+
+# --- Maintenance commands ---
+# These only read local files, so they run without pandas or a browser.
+def save_run_stats(command: str, start_time: float, stats: dict) -> None:
+    stats = {'command': command, 'finished_at': datetime.now(timezone.utc).isoformat(),
+             'duration_seconds': round(time.time() - start_time, 2), 'startup_ms': _startup_ms, **stats}
+    try:
+        os.makedirs(os.path.dirname(RUN_STATS_PATH), exist_ok=True)
+        with open(RUN_STATS_PATH, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+    except Exception as e:
+        logging.warning(f"Failed to save run stats: {e}")
+
+
+def validate_profiles(profiles: dict) -> list[str]:
+    """Problems with the profile configuration, as readable messages (empty when it is valid)"""
+    problems = []
+    for name, cfg in profiles.items():
+        search = cfg.get("search", {})
+        if not search.get("location"):
+            problems.append(f"{name}: search.location is missing")
+        dates = []
+        for field in ("date_from", "date_to"):
+            try:
+                dates.append(datetime.strptime(search.get(field, ""), "%d %b %Y"))
+            except ValueError:
+                problems.append(f"{name}: search.{field} {search.get(field)!r} is not like '27 Dec 2025'")
+        if len(dates) == 2 and dates[0] > dates[1]:
+            problems.append(f"{name}: search.date_from is after search.date_to")
+        split = search.get("split")
+        if split is not None and split != "month" and not (isinstance(split, int) and split > 0):
+            problems.append(f"{name}: search.split must be \"month\" or a positive number of days")
+
+        filters = cfg.get("filters", {})
+        if not isinstance(filters.get("excluded_countries", []), list):
+            problems.append(f"{name}: filters.excluded_countries must be a list")
+        for pet_type, max_count in filters.get("max_pets", {}).items():
+            if pet_type not in PET_TYPES:
+                problems.append(f"{name}: filters.max_pets has unknown pet type {pet_type!r}")
+            if not isinstance(max_count, int):
+                problems.append(f"{name}: filters.max_pets.{pet_type} must be a whole number")
+        if not isinstance(filters.get("min_days", 0), int):
+            problems.append(f"{name}: filters.min_days must be a whole number")
+
+        notification = cfg.get("notification", {})
+        if notification.get("delivery", "immediate") not in ("immediate", "throttled", "digest"):
+            problems.append(f"{name}: notification.delivery must be immediate, throttled or digest")
+        for spec in notification.get("channels", []):
+            kind = spec if isinstance(spec, str) else spec.get("type")
+            if kind not in NOTIFIER_TYPES:
+                problems.append(f"{name}: unknown notification channel {kind!r}")
+    return problems
+
+
+def list_profiles(profiles: dict) -> None:
+    for name, cfg in profiles.items():
+        search = cfg.get("search", {})
+        notification = cfg.get("notification", {})
+        split = f", split by {search['split']}" if search.get("split") else ""
+        channels = ", ".join(c if isinstance(c, str) else c.get("name", c.get("type"))
+                             for c in notification.get("channels", ["telegram"]))
+        print(f"{name}: {search.get('location')} {search.get('date_from')} → {search.get('date_to')}{split}; "
+              f"{notification.get('delivery', 'immediate')} via {channels}")
+
+
+def show_last_run() -> None:
+    try:
+        with open(RUN_STATS_PATH, 'r', encoding='utf-8') as f:
+            print(json.dumps(json.load(f), indent=2, ensure_ascii=False))
+    except FileNotFoundError:
+        print(f"No run stats yet ({RUN_STATS_PATH})")
+    pending = {f"{profile}/{channel}": len(entry['pending'])
+               for profile, channels in load_notify_buffer().items()
+               for channel, entry in channels.items() if entry['pending']}
+    print(f"Pending alerts: {pending or 'none'}")
+
+
+_startup_ms = None
+
 
 if __name__ == '__main__':
     try:
         parser = argparse.ArgumentParser()
         parser.add_argument('--test', action='store_true', help='Run in test mode (limited results)')
+        parser.add_argument('--stream', action='store_true',
+                            help='Alert on each new listing as soon as it is scraped instead of at the end of the run')
+        parser.add_argument('--shard', metavar='I/N',
+                            help='Scrape only shard I of N (0-based) of the query plan and write its partial results')
+        parser.add_argument('--merge-shards', action='store_true',
+                            help='Combine the partial shard results into the state and send alerts')
+        parser.add_argument('--profile-calls', action='store_true',
+                            help=f'Profile browser calls and write {CALL_PROFILE_PATH} / {CALL_FOLDED_PATH}')
+        parser.add_argument('--compact', action='store_true',
+                            help='Rebuild current state from the event log, rewrite the snapshots and exit')
+        parser.add_argument('--history', metavar='KEY', help='Print the event history of a unique_key or listing_id')
+        parser.add_argument('--list-profiles', action='store_true', help='List the search profiles and exit')
+        parser.add_argument('--validate-profiles', action='store_true',
+                            help=f'Check {PROFILES_PATH} and exit non-zero if it has problems')
+        parser.add_argument('--last-run', action='store_true', help='Show the stats of the last run and pending alerts')
+        parser.add_argument('--resend-pending', action='store_true',
+                            help='Send every pending alert now, ignoring throttle and digest schedules')
         args = parser.parse_args()
-        
-        asyncio.run(main(test_mode=args.test))
+
+        light = args.list_profiles or args.validate_profiles or args.last_run or args.history
+        setup_logging(log_file=not light)
+        load_environment()
+        _startup_ms = round((time.perf_counter() - _process_started) * 1000)
+        logging.info(f"Started in {_startup_ms} ms")
+
+        if args.profile_calls:
+            enable_call_profiling()
+        if args.shard:
+            shard_index, shard_count = (int(x) for x in args.shard.split('/'))
+            if not 0 <= shard_index < shard_count:
+                parser.error(f"--shard index must be between 0 and {shard_count - 1}")
+            asyncio.run(run_shard(shard_index, shard_count, test_mode=args.test))
+        elif args.merge_shards:
+            asyncio.run(merge_shards())
+        elif args.compact:
+            compact_events(rebuild=True)
+        elif args.history:
+            for ev in listing_history(args.history):
+                print(json.dumps(ev, ensure_ascii=False))
+        elif args.list_profiles:
+            list_profiles(load_profiles())
+        elif args.validate_profiles:
+            problems = validate_profiles(load_profiles())
+            for problem in problems:
+                print(problem)
+            print(f"{len(problems)} problems found" if problems else f"{PROFILES_PATH} is valid")
+            sys.exit(1 if problems else 0)
+        elif args.last_run:
+            show_last_run()
+        elif args.resend_pending:
+            sent = deliver_notifications(load_profiles(), [], force=True)
+            logging.info(f"Resent pending alerts in {sent} messages")
+        else:
+            asyncio.run(main(test_mode=args.test, stream=args.stream))
     except Exception:
         logging.critical("Unhandled exception in main", exc_info=True)
         raise
+    finally:
+        write_call_profile()